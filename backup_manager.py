@@ -4,10 +4,17 @@
 功能：清理项目根目录中的备份文件，确保新备份保存到backups目录
 """
 import os
+import re
 import sys
 from pathlib import Path
 import glob
-from datetime import datetime
+
+from script_utils import confirm, emit_lines, format_timestamp, list_backups, unlink_in_dir
+
+# 项目根目录中的备份文件：requirements_backup_*.txt、*.bak、*.backup
+# （requirements.txt.bak / requirements.txt.backup 已包含在后缀规则中；Windows下与glob一样不区分大小写）
+_ROOT_BACKUP_RE = re.compile(r'requirements_backup_.*\.txt|.*\.(?:bak|backup)',
+                             re.S | (re.I if os.name == 'nt' else 0))
 
 
 class BackupManager:
@@ -18,82 +25,68 @@ class BackupManager:
         self.project_root = Path.cwd()
         self.backup_dir = self.project_root / "backups"
         self.backup_dir.mkdir(exist_ok=True)  # 确保backups目录存在
+        self._dir_ensured = True
+
+    def _scan_root_backups(self):
+        """单次扫描项目根目录，返回其中的备份文件条目"""
+        with os.scandir(self.project_root) as entries:
+            return [entry for entry in entries
+                    if entry.is_file() and _ROOT_BACKUP_RE.fullmatch(entry.name)]
 
     def clean_existing_backups(self):
         """清理现有备份文件"""
-        print("=" * 50)
-        print("开始清理备份文件")
-        print("=" * 50)
+        emit_lines(["=" * 50, "开始清理备份文件", "=" * 50])
 
         deleted_files = []
 
         # 清理项目根目录中的备份文件
-        patterns = [
-            "requirements_backup_*.txt",
-            "requirements.txt.bak",
-            "requirements.txt.backup",
-            "*.backup",
-            "*.bak"
-        ]
-
-        for pattern in patterns:
-            for file_path in self.project_root.glob(pattern):
-                try:
-                    os.remove(file_path)
-                    deleted_files.append(file_path.name)
-                    print(f"✓ 已删除: {file_path.name}")
-                except Exception as e:
-                    print(f"✗ 删除失败 {file_path.name}: {e}")
-
-        # 清理backups目录，只保留最新的3个备份
-        if self.backup_dir.exists():
-            backup_files = list(self.backup_dir.glob("requirements_backup_*.txt"))
-            if backup_files:
-                # 按修改时间排序（最新的在前面）
-                backup_files.sort(key=lambda x: x.stat().st_mtime, reverse=True)
-
-                # 保留最新的3个，删除其他的
-                if len(backup_files) > 3:
-                    for old_file in backup_files[3:]:
-                        try:
-                            os.remove(old_file)
-                            deleted_files.append(f"backups/{old_file.name}")
-                            print(f"✓ 已删除旧备份: backups/{old_file.name}")
-                        except Exception as e:
-                            print(f"✗ 删除失败 {old_file.name}: {e}")
+        root_backups = self._scan_root_backups()
+
+        for name, error in unlink_in_dir(self.project_root, [entry.name for entry in root_backups]):
+            if error is None:
+                deleted_files.append(name)
+                print(f"✓ 已删除: {name}")
+            else:
+                print(f"✗ 删除失败 {name}: {error}")
+
+        # 清理backups目录，只保留最新的3个备份（目录在初始化时已确保存在）
+        backup_files = list_backups(self.backup_dir)
+
+        # 保留最新的3个，删除其他的
+        stale = [name for _, name, _ in backup_files[3:]]
+        for name, error in unlink_in_dir(self.backup_dir, stale):
+            if error is None:
+                deleted_files.append(f"backups/{name}")
+                print(f"✓ 已删除旧备份: backups/{name}")
+            else:
+                print(f"✗ 删除失败 {name}: {error}")
 
         return deleted_files
 
     def show_status(self):
         """显示备份文件状态"""
-        print("\n" + "=" * 50)
-        print("当前备份文件状态")
-        print("=" * 50)
+        lines = ["\n" + "=" * 50, "当前备份文件状态", "=" * 50]
 
         # 检查项目根目录
-        root_backups = []
-        for pattern in ["requirements_backup_*.txt", "*.bak", "*.backup"]:
-            root_backups.extend(list(self.project_root.glob(pattern)))
+        root_backups = self._scan_root_backups()
 
         if root_backups:
-            print(f"项目根目录中发现 {len(root_backups)} 个备份文件:")
-            for file_path in root_backups:
-                print(f"  📄 {file_path.name}")
+            lines.append(f"项目根目录中发现 {len(root_backups)} 个备份文件:")
+            lines.extend(f"  📄 {entry.name}" for entry in root_backups)
         else:
-            print("✓ 项目根目录中没有备份文件")
+            lines.append("✓ 项目根目录中没有备份文件")
 
         # 检查backups目录
-        if self.backup_dir.exists():
-            backup_files = list(self.backup_dir.glob("requirements_backup_*.txt"))
-            if backup_files:
-                print(f"\nbackups目录中有 {len(backup_files)} 个备份文件:")
-                backup_files.sort(key=lambda x: x.stat().st_mtime, reverse=True)
-                for i, file_path in enumerate(backup_files[:3], 1):
-                    mtime = datetime.fromtimestamp(file_path.stat().st_mtime)
-                    print(f"  {i}. {file_path.name}")
-                    print(f"     创建时间: {mtime.strftime('%Y-%m-%d %H:%M:%S')}")
-            else:
-                print("\nbackups目录中没有备份文件")
+        backup_files = list_backups(self.backup_dir)
+        if backup_files:
+            lines.append(f"\nbackups目录中有 {len(backup_files)} 个备份文件:")
+            for i, (timestamp, name, _) in enumerate(backup_files[:3], 1):
+                lines.append(f"  {i}. {name}")
+                lines.append(f"     创建时间: {format_timestamp(timestamp)}")
+        else:
+            lines.append("\nbackups目录中没有备份文件")
+
+        emit_lines(lines)
 
     def setup_backup_system(self):
         """设置备份系统"""
@@ -101,16 +94,24 @@ class BackupManager:
         print("设置备份系统")
         print("=" * 50)
 
-        # 确保backups目录存在
-        self.backup_dir.mkdir(exist_ok=True)
+        # 确保backups目录存在（初始化时已创建则不再重复mkdir）
+        if not self._dir_ensured:
+            self.backup_dir.mkdir(exist_ok=True)
+            self._dir_ensured = True
         print(f"✓ 确保backups目录存在: {self.backup_dir}")
 
         print("\n✅ 备份系统设置完成")
         print("   所有新备份文件将自动保存到: backups/")
 
 
-def main():
+def main(argv=None):
     """主函数"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="备份文件管理工具")
+    parser.add_argument("-y", "--yes", action="store_true", help="不询问，直接清理所有现有备份文件")
+    args = parser.parse_args(argv)
+
     print("备份文件管理工具")
     print("=" * 50)
 
@@ -121,8 +122,7 @@ def main():
     manager.show_status()
 
     # 询问是否清理现有备份
-    response = input("\n是否清理所有现有备份文件? (y/n): ")
-    if response.lower() == 'y':
+    if confirm("\n是否清理所有现有备份文件? (y/n): ", args.yes):
         deleted = manager.clean_existing_backups()
         if deleted:
             print(f"\n✅ 清理完成，共删除 {len(deleted)} 个文件")
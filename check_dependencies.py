@@ -5,20 +5,55 @@
 修复：解决时间戳错误，确保新备份文件时间正确
 """
 import os
+import re
 import sys
-import subprocess
-import logging
 from pathlib import Path
 from datetime import datetime
-import shutil
-import time
 from typing import List, Tuple, Dict
 
+from script_utils import (
+    confirm, emit_lines, format_timestamp, list_backups, scan_backups, sort_backups, unlink_in_dir
+)
+
+# subprocess / shutil / logging 等模块只在实际用到的方法内导入，
+# 仅导入本模块（如单元测试中使用辅助函数）时不承担这部分开销
+
+# requirements.txt 中的一行依赖：包名，可选的 [extras] 与 ==版本，其余版本约束与行尾注释忽略；
+# 空行、注释行和 -r/-e 等选项行不匹配
+_REQUIREMENT_RE = re.compile(
+    r'^[ \t]*([A-Za-z0-9][A-Za-z0-9_.\-]*)[ \t]*(?:\[[^\]]*\])?[ \t]*(?:==[ \t]*([^\s#;]+))?[^\n#]*(?:#.*)?$',
+    re.M
+)
+
+
+def copy_file_contents(src, dst) -> None:
+    """
+    复制文件内容
+    Linux下使用 os.copy_file_range 在内核中完成拷贝，其他平台回退到 shutil.copyfileobj
+    """
+    if hasattr(os, "copy_file_range"):
+        remaining = os.fstat(src.fileno()).st_size
+        try:
+            while remaining > 0:
+                copied = os.copy_file_range(src.fileno(), dst.fileno(), remaining)
+                if copied == 0:
+                    break
+                remaining -= copied
+            return
+        except OSError:
+            # 文件系统不支持时从当前偏移继续用通用方式复制
+            pass
+
+    import shutil
+    shutil.copyfileobj(src, dst)
+
 
 class DependencyChecker:
     """依赖检查器 - 集成备份管理"""
 
     def __init__(self):
+        import logging
+
         self.project_root = Path.cwd()
         self.backup_dir = self.project_root / "backups"
         self.backup_dir.mkdir(exist_ok=True)
@@ -49,12 +84,20 @@ class DependencyChecker:
             backup_name = f"requirements_backup_{timestamp}.txt"
             backup_path = self.backup_dir / backup_name
 
+            # 设置文件创建时间为当前时间（纳秒）
+            current_ns = int(current_time.timestamp() * 1e9)
+            set_times_by_fd = os.utime in os.supports_fd
+
             # 复制文件
-            shutil.copy2(requirements_file, backup_path)
+            with open(requirements_file, 'rb') as src, open(backup_path, 'wb') as dst:
+                copy_file_contents(src, dst)
+                if set_times_by_fd:
+                    # 写入完成后直接通过文件描述符设置时间（futimens），无需关闭后再按路径查找
+                    dst.flush()
+                    os.utime(dst.fileno(), ns=(current_ns, current_ns))
 
-            # 设置文件创建时间为当前时间
-            current_timestamp = time.mktime(current_time.timetuple())
-            os.utime(backup_path, (current_timestamp, current_timestamp))
+            if not set_times_by_fd:
+                os.utime(backup_path, ns=(current_ns, current_ns))
 
             self.log.info(f"✅ 已创建新备份: {backup_name}")
             self.log.info(f"   创建时间: {current_time.strftime('%Y-%m-%d %H:%M:%S')}")
@@ -70,39 +113,25 @@ class DependencyChecker:
         按文件名中的时间戳排序，而不是文件修改时间
         """
         try:
-            # 获取所有备份文件
-            backup_pattern = "requirements_backup_*.txt"
-            backup_files = list(self.backup_dir.glob(backup_pattern))
+            # 获取所有备份文件（时间戳只解析一次）
+            backup_files = scan_backups(self.backup_dir)
 
+            # 常见情况下数量未超出保留数，无需排序
             if len(backup_files) <= keep_count:
                 return 0
 
-            # 从文件名中提取时间戳并排序
-            def extract_timestamp(file_path):
-                # 从文件名提取时间戳：requirements_backup_YYYYMMDD_HHMMSS.txt
-                name = file_path.name
-                if name.startswith("requirements_backup_") and name.endswith(".txt"):
-                    timestamp_str = name[20:-4]  # 移除前缀和后缀
-                    try:
-                        return datetime.strptime(timestamp_str, "%Y%m%d_%H%M%S")
-                    except:
-                        return datetime.min
-                return datetime.min
-
-            # 按文件名中的时间戳排序（最新的在前）
-            backup_files.sort(key=lambda x: extract_timestamp(x), reverse=True)
+            sort_backups(backup_files)
 
             deleted_count = 0
 
             # 保留最新的keep_count个，删除其他的
-            for i, backup_file in enumerate(backup_files):
-                if i >= keep_count:
-                    try:
-                        backup_file.unlink()
-                        deleted_count += 1
-                        self.log.info(f"🗑️ 已清理旧备份: {backup_file.name}")
-                    except Exception as e:
-                        self.log.error(f"❌ 删除失败 {backup_file.name}: {e}")
+            stale = [name for _, name, _ in backup_files[keep_count:]]
+            for name, error in unlink_in_dir(self.backup_dir, stale):
+                if error is None:
+                    deleted_count += 1
+                    self.log.info(f"🗑️ 已清理旧备份: {name}")
+                else:
+                    self.log.error(f"❌ 删除失败 {name}: {error}")
 
             if deleted_count > 0:
                 self.log.info(f"✅ 已清理 {deleted_count} 个旧备份文件")
@@ -116,55 +145,43 @@ class DependencyChecker:
     def get_installed_packages(self) -> Dict[str, str]:
         """
         获取已安装的包列表
-        使用 pip list 命令，返回 {包名: 版本} 字典
+        直接读取当前解释器的包元数据，返回 {包名: 版本} 字典
+        Python 3.7 没有 importlib.metadata，回退到 pip list --format=json
         """
         try:
+            from importlib.metadata import distributions
+        except ImportError:
+            import json
+            import subprocess
+
             result = subprocess.run(
-                [sys.executable, "-m", "pip", "list", "--format=freeze"],
+                [sys.executable, "-m", "pip", "list", "--format=json"],
                 capture_output=True,
                 text=True,
                 check=True
             )
+            return {pkg['name'].lower(): pkg['version'] for pkg in json.loads(result.stdout)}
 
-            packages = {}
-            for line in result.stdout.strip().split('\n'):
-                if '==' in line:
-                    pkg, ver = line.split('==', 1)
-                    packages[pkg.strip().lower()] = ver.strip()
-
-            return packages
-        except subprocess.CalledProcessError as e:
-            self.log.error(f"❌ 获取已安装包失败: {e}")
-            return {}
+        packages = {}
+        for dist in distributions():
+            name = dist.metadata['Name']
+            # 与 pip list 一致：sys.path 中靠前的同名包优先
+            if name:
+                packages.setdefault(name.lower(), dist.version)
+        return packages
 
     def parse_requirements(self, filepath: Path) -> List[Tuple[str, str]]:
         """
         解析requirements.txt文件
         返回(包名, 版本要求)列表
         """
-        requirements = []
-
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                for line in f:
-                    line = line.strip()
-
-                    # 跳过空行和注释
-                    if not line or line.startswith('#'):
-                        continue
-
-                    # 提取包名和版本
-                    if '==' in line:
-                        pkg, ver = line.split('==', 1)
-                        requirements.append((pkg.strip().lower(), ver.strip()))
-                    else:
-                        # 没有指定版本
-                        requirements.append((line.strip().lower(), ''))
-
+            content = filepath.read_text(encoding='utf-8')
         except Exception as e:
             self.log.error(f"❌ 解析requirements.txt失败: {e}")
+            return []
 
-        return requirements
+        return [(m.group(1).lower(), m.group(2) or '') for m in _REQUIREMENT_RE.finditer(content)]
 
     def check_dependencies(self) -> Tuple[List[str], List[str]]:
         """
@@ -177,72 +194,61 @@ class DependencyChecker:
             self.log.error("❌ requirements.txt文件不存在")
             return [], []
 
-        # 创建新备份
-        backup_created = self.create_new_backup()
-        if not backup_created:
-            self.log.warning("⚠ 备份创建失败，继续检查依赖")
+        from concurrent.futures import ThreadPoolExecutor
 
-        # 清理旧备份
-        self.cleanup_old_backups(3)
+        # 获取已安装的包与解析requirements.txt 互不依赖，并发执行
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            installed_future = executor.submit(self.get_installed_packages)
+            required_future = executor.submit(self.parse_requirements, requirements_file)
 
-        # 获取已安装的包
-        installed = self.get_installed_packages()
+            # 先等包扫描完成：扫描失败时直接抛出，不留下新备份或被清理的旧备份
+            installed = installed_future.result()
 
-        # 解析requirements.txt
-        required = self.parse_requirements(requirements_file)
+            if not self.create_new_backup():
+                self.log.warning("⚠ 备份创建失败，继续检查依赖")
+
+            # 清理旧备份（须在新备份创建之后）
+            self.cleanup_old_backups(3)
+
+            required = required_future.result()
 
         missing = []
         satisfied = []
 
+        # 包名在解析时已统一小写，用一次集合差运算找出未安装的包
+        missing_names = {pkg for pkg, _ in required} - frozenset(installed)
+
         for pkg, required_ver in required:
-            if pkg in installed:
-                installed_ver = installed[pkg]
+            if pkg in missing_names:
+                missing.append(f"{pkg}=={required_ver}" if required_ver else pkg)
+                continue
 
-                if required_ver and installed_ver != required_ver:
-                    missing.append(f"{pkg}=={required_ver} (已安装: {installed_ver})")
-                else:
-                    satisfied.append(f"{pkg}=={installed_ver}" if installed_ver else pkg)
+            installed_ver = installed[pkg]
+            if required_ver and installed_ver != required_ver:
+                missing.append(f"{pkg}=={required_ver} (已安装: {installed_ver})")
             else:
-                missing.append(f"{pkg}=={required_ver}" if required_ver else pkg)
+                satisfied.append(f"{pkg}=={installed_ver}" if installed_ver else pkg)
 
         return missing, satisfied
 
     def show_backup_status(self):
         """显示备份文件状态"""
         try:
-            backup_files = list(self.backup_dir.glob("requirements_backup_*.txt"))
+            backup_files = list_backups(self.backup_dir)
 
             if backup_files:
-                # 从文件名中提取时间戳并排序
-                def extract_timestamp(file_path):
-                    name = file_path.name
-                    if name.startswith("requirements_backup_") and name.endswith(".txt"):
-                        timestamp_str = name[20:-4]
-                        try:
-                            return datetime.strptime(timestamp_str, "%Y%m%d_%H%M%S")
-                        except:
-                            return datetime.min
-                    return datetime.min
-
-                backup_files.sort(key=lambda x: extract_timestamp(x), reverse=True)
-
-                print(f"\n📁 备份文件状态 (共 {len(backup_files)} 个):")
-                print("-" * 60)
-                for i, file_path in enumerate(backup_files, 1):
-                    # 从文件名中提取创建时间
-                    timestamp = extract_timestamp(file_path)
-                    if timestamp != datetime.min:
-                        time_str = timestamp.strftime('%Y-%m-%d %H:%M:%S')
-                    else:
-                        time_str = "未知时间"
-
-                    file_size = file_path.stat().st_size
+                lines = [f"\n📁 备份文件状态 (共 {len(backup_files)} 个):", "-" * 60]
+                for i, (timestamp, name, entry) in enumerate(backup_files, 1):
+                    time_str = format_timestamp(timestamp)
+
+                    file_size = entry.stat().st_size
                     status = "🟢 最新" if i == 1 else "🟡 保留" if i <= 3 else "🔴 待清理"
-                    print(f"  {status} {i:2d}. {file_path.name}")
-                    print(f"      创建: {time_str}")
-                    print(f"      大小: {file_size:,} bytes")
+                    lines.append(f"  {status} {i:2d}. {name}")
+                    lines.append(f"      创建: {time_str}")
+                    lines.append(f"      大小: {file_size:,} bytes")
                     if i == 3:
-                        print("-" * 60)
+                        lines.append("-" * 60)
+                emit_lines(lines)
             else:
                 print("\n📁 当前没有备份文件")
 
@@ -259,34 +265,35 @@ class DependencyChecker:
 
         self.log.info(f"🔧 开始安装 {len(missing)} 个缺失的依赖")
 
-        all_success = True
-        for dep in missing:
-            try:
-                # 提取包名（去掉版本信息）
-                pkg = dep.split('==')[0] if '==' in dep else dep
-
-                self.log.info(f"📦 正在安装: {pkg}")
-                result = subprocess.run(
-                    [sys.executable, "-m", "pip", "install", pkg],
-                    capture_output=True,
-                    text=True
-                )
-
-                if result.returncode == 0:
-                    self.log.info(f"✅ 安装成功: {pkg}")
-                else:
-                    self.log.error(f"❌ 安装失败 {pkg}: {result.stderr[:200]}")
-                    all_success = False
+        import subprocess
+
+        # 提取包名（去掉版本信息），一次pip调用安装全部缺失包
+        pkgs = [dep.split('==')[0] if '==' in dep else dep for dep in missing]
+
+        try:
+            self.log.info(f"📦 正在安装: {' '.join(pkgs)}")
+            result = subprocess.run(
+                [sys.executable, "-m", "pip", "install", *pkgs],
+                capture_output=True,
+                text=True
+            )
+
+            if result.returncode == 0:
+                self.log.info(f"✅ 安装成功: {' '.join(pkgs)}")
+                return True
 
-            except Exception as e:
-                self.log.error(f"❌ 安装 {dep} 时出错: {e}")
-                all_success = False
+            self.log.error(f"❌ 安装失败: {result.stderr[:200]}")
+            return False
 
-        return all_success
+        except Exception as e:
+            self.log.error(f"❌ 安装依赖时出错: {e}")
+            return False
 
-    def run(self) -> bool:
+    def run(self, assume_yes: bool = False, allow_install: bool = True) -> bool:
         """
         运行完整的依赖检查流程
+        assume_yes: 不询问，直接安装缺失的依赖
+        allow_install: 为False时只检查，不安装
         返回是否所有依赖都已满足
         """
         print("=" * 60)
@@ -311,10 +318,12 @@ class DependencyChecker:
             for dep in missing:
                 print(f"  ✗ {dep}")
 
+            if not allow_install:
+                return False
+
             # 询问是否安装
             print("\n" + "=" * 60)
-            response = input("是否自动安装缺失的依赖? (y/n): ")
-            if response.lower() == 'y':
+            if confirm("是否自动安装缺失的依赖? (y/n): ", assume_yes):
                 success = self.install_missing_dependencies(missing)
                 if success:
                     print("\n🎉 所有依赖安装完成！")
@@ -328,11 +337,18 @@ class DependencyChecker:
             return True
 
 
-def main():
+def main(argv=None):
     """主函数"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="汽车电源测试框架 - 依赖检查工具")
+    parser.add_argument("-y", "--yes", action="store_true", help="不询问，直接安装缺失的依赖")
+    parser.add_argument("--no-install", action="store_true", help="只检查依赖，不安装")
+    args = parser.parse_args(argv)
+
     try:
         checker = DependencyChecker()
-        success = checker.run()
+        success = checker.run(assume_yes=args.yes, allow_install=not args.no_install)
         return 0 if success else 1
     except KeyboardInterrupt:
         print("\n\n⏹️ 操作被用户中断")
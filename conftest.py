@@ -3,8 +3,8 @@ import os
 
 # 获取项目根目录的绝对路径
 project_root = os.path.dirname(os.path.abspath(__file__))
-# 将项目根目录添加到sys.path的最前面
-if project_root not in sys.path:
+# 将项目根目录添加到sys.path的最前面（只比较首项，无需线性扫描整个sys.path）
+if sys.path[:1] != [project_root]:
     sys.path.insert(0, project_root)
 
 # 你原有的conftest.py代码继续写在这里...
@@ -2,239 +2,92 @@
 汽车电源测试框架 - 环境修复脚本（增强版）
 此脚本将诊断并修复PyYAML安装问题，使用ruamel.yaml替代
 """
+import atexit
+import hashlib
+import importlib
+import importlib.util
 import os
+import re
 import sys
 import subprocess
 import platform
 import logging
+import logging.handlers
+import queue
 import shutil
+import socket
+import threading
+from collections import deque
 from pathlib import Path
-from typing import Tuple, Dict, Any, Optional
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Tuple, Dict, Any, List, Optional, Set, Union
+
+from script_utils import confirm
 
 # 配置日志
+# 日志文件由后台 QueueListener 线程写入，磁盘I/O不阻塞主流程；
+# 控制台输出保持同步，以免与 print() 的输出顺序错乱
+_LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+_log_queue = queue.Queue(-1)
+_file_handler = logging.FileHandler('environment_fix.log', encoding='utf-8')
+_file_handler.setFormatter(logging.Formatter(_LOG_FORMAT))
+_log_listener = logging.handlers.QueueListener(_log_queue, _file_handler)
+_log_listener.start()
+atexit.register(_log_listener.stop)  # 退出前把队列中剩余的日志写完
+
+_queue_handler = logging.handlers.QueueHandler(_log_queue)
+_queue_handler.setFormatter(logging.Formatter('%(message)s'))  # 完整格式由文件处理器添加
+
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
+    format=_LOG_FORMAT,
     handlers=[
         logging.StreamHandler(sys.stdout),
-        logging.FileHandler('environment_fix.log', encoding='utf-8')
+        _queue_handler
     ]
 )
 logger = logging.getLogger(__name__)
 
+# pip install 输出中的 "Successfully installed name-version ..." 行
+_INSTALLED_RE = re.compile(r'^Successfully installed (.+)$', re.M)
 
-class EnvironmentFixer:
-    """环境修复器类"""
-
-    def __init__(self):
-        self.project_root = os.getcwd()
-        self.system_info = self.get_system_info()
-        self.python_info = self.get_python_info()
-
-    def get_system_info(self) -> Dict[str, Any]:
-        """获取系统信息"""
-        return {
-            "system": platform.system(),
-            "release": platform.release(),
-            "version": platform.version(),
-            "machine": platform.machine(),
-            "processor": platform.processor(),
-            "architecture": platform.architecture()[0]
-        }
-
-    def get_python_info(self) -> Dict[str, Any]:
-        """获取Python信息"""
-        return {
-            "version": sys.version,
-            "executable": sys.executable,
-            "platform": sys.platform,
-            "path": sys.path[:3]  # 只显示前3个路径
-        }
-
-    def print_banner(self):
-        """打印横幅"""
-        print("\n" + "=" * 70)
-        print("汽车电源测试框架 - 环境诊断与修复工具")
-        print("=" * 70)
-        print(f"项目路径: {self.project_root}")
-        print(f"操作系统: {self.system_info['system']} {self.system_info['release']}")
-        print(f"Python路径: {self.python_info['executable']}")
-        print(f"Python版本: {sys.version.split()[0]}")
-        print("=" * 70 + "\n")
-
-    def check_virtual_env(self) -> bool:
-        """检查是否在虚拟环境中"""
-        in_venv = hasattr(sys, 'real_prefix') or (hasattr(sys, 'base_prefix') and sys.base_prefix != sys.prefix)
-
-        if in_venv:
-            logger.info("✓ 检测到虚拟环境")
-            return True
-        else:
-            logger.warning("⚠ 未检测到虚拟环境，建议在虚拟环境中运行")
-
-            # 检查是否有常见的虚拟环境目录
-            venv_dirs = ['venv', '.venv', 'env']
-            for venv_dir in venv_dirs:
-                if os.path.exists(venv_dir):
-                    logger.info(f"发现虚拟环境目录: {venv_dir}")
-
-                    # 检查激活脚本
-                    if self.system_info['system'] == 'Windows':
-                        activate_script = os.path.join(venv_dir, 'Scripts', 'activate.bat')
-                    else:
-                        activate_script = os.path.join(venv_dir, 'bin', 'activate')
-
-                    if os.path.exists(activate_script):
-                        logger.info(f"虚拟环境激活脚本: {activate_script}")
-                        print(f"\n请先激活虚拟环境:")
-                        if self.system_info['system'] == 'Windows':
-                            print(f"  {venv_dir}\\Scripts\\activate")
-                        else:
-                            print(f"  source {venv_dir}/bin/activate")
-                        print("然后重新运行此脚本。\n")
-                        return False
-
-            response = input("是否继续在全局环境中安装? (y/n): ")
-            return response.lower() == 'y'
-
-    def run_command(self, cmd: str, check: bool = True, cwd: Optional[str] = None) -> Tuple[bool, str]:
-        """运行命令行命令"""
-        if cwd is None:
-            cwd = self.project_root
-
-        logger.debug(f"执行命令: {cmd}")
-        logger.debug(f"工作目录: {cwd}")
-
-        try:
-            result = subprocess.run(
-                cmd,
-                shell=True,
-                capture_output=True,
-                text=True,
-                cwd=cwd,
-                encoding='utf-8',
-                errors='ignore'
-            )
-
-            if result.returncode != 0:
-                error_msg = f"命令执行失败 (返回码: {result.returncode}):\n"
-                if result.stderr:
-                    error_msg += f"错误输出:\n{result.stderr}\n"
-                if result.stdout:
-                    error_msg += f"标准输出:\n{result.stdout}"
-
-                logger.error(error_msg)
-
-                if check:
-                    return False, error_msg
-                else:
-                    return False, result.stderr or result.stdout or ""
-            else:
-                logger.debug(f"命令输出: {result.stdout[:500]}")  # 只记录前500字符
-                return True, result.stdout
-
-        except Exception as e:
-            error_msg = f"执行命令时发生异常: {str(e)}"
-            logger.error(error_msg)
-            return False, error_msg
-
-    def upgrade_pip_tools(self) -> bool:
-        """升级pip、setuptools和wheel"""
-        logger.info("升级pip、setuptools和wheel...")
-
-        tools = ["pip", "setuptools", "wheel"]
-        all_success = True
-
-        for tool in tools:
-            logger.info(f"正在升级 {tool}...")
-            success, output = self.run_command(
-                f"{sys.executable} -m pip install --upgrade {tool}",
-                check=False
-            )
-
-            if success:
-                logger.info(f"✓ {tool} 升级成功")
-            else:
-                logger.warning(f"⚠ {tool} 升级可能有问题: {output[:200]}")
-                all_success = False
-
-        return all_success
-
-    def clean_pyyaml_installations(self) -> bool:
-        """清理所有PyYAML安装"""
-        logger.info("清理现有的PyYAML安装...")
-
-        # 尝试卸载不同可能的大小写
-        pyyaml_names = ["pyyaml", "PyYAML", "PyYaml"]
-
-        for name in pyyaml_names:
-            success, output = self.run_command(
-                f"{sys.executable} -m pip uninstall {name} -y",
-                check=False
-            )
-
-            if "not installed" not in output:
-                logger.info(f"已尝试卸载: {name}")
+# run_command 保留的命令输出行数（只保留末尾部分）
+_OUTPUT_TAIL_LINES = 500
 
-        # 检查是否还有残留
-        success, output = self.run_command(
-            f"{sys.executable} -c \"import sys; exec('try:\\n import yaml\\n print(\\\"FOUND\\\" + yaml.__version__)\\nexcept:\\n print(\\\"NOT_FOUND\\\")')\"",
-            check=False
-        )
 
-        if "FOUND" in output:
-            logger.warning("PyYAML仍然存在，可能需要手动清理")
-            return False
+# 依赖文件中固定版本的一行：包名==版本
+_PINNED_RE = re.compile(rb'^[ \t]*([A-Za-z0-9][A-Za-z0-9_.\-]*)[ \t]*==[ \t]*([^\s#;]+)', re.M)
 
-        logger.info("✓ PyYAML清理完成")
-        return True
 
-    def install_ruamel_yaml(self) -> bool:
-        """安装ruamel.yaml作为PyYAML的替代品"""
-        logger.info("安装ruamel.yaml...")
+def installed_version(name: str) -> Optional[str]:
+    """从包的元数据读取当前环境中已安装的版本（不导入包），未安装时返回None"""
+    try:
+        from importlib import metadata
+    except ImportError:  # Python 3.7 没有 importlib.metadata，视为无法确认
+        return None
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return None
 
-        # 尝试不同版本
-        ruamel_versions = [
-            "ruamel.yaml==0.17.21",  # 稳定版本
-            "ruamel.yaml",  # 最新版本
-            "ruamel.yaml<0.18"  # 0.17.x系列
-        ]
 
-        for version in ruamel_versions:
-            logger.info(f"尝试安装: {version}")
-            success, output = self.run_command(
-                f"{sys.executable} -m pip install {version}",
-                check=False
-            )
+def pins_satisfied(requirements: bytes) -> bool:
+    """依赖文件中每个 包名==版本 是否都已按该版本安装在当前环境中"""
+    return all(installed_version(name.decode()) == version.decode()
+               for name, version in _PINNED_RE.findall(requirements))
 
-            if success:
-                logger.info(f"✓ ruamel.yaml 安装成功")
-
-                # 验证安装
-                test_success, test_output = self.run_command(
-                    f"{sys.executable} -c \"from ruamel.yaml import YAML; print('IMPORT_SUCCESS')\"",
-                    check=False
-                )
 
-                if test_success and "IMPORT_SUCCESS" in test_output:
-                    logger.info("✓ ruamel.yaml 导入测试成功")
-                    return True
-                else:
-                    logger.warning("ruamel.yaml 安装但导入失败，尝试下一个版本")
-            else:
-                logger.warning(f"安装 {version} 失败: {output[:200]}")
+def parse_installed_packages(output: str) -> Set[str]:
+    """从pip install的输出中解析本次实际安装/升级的包名（小写）"""
+    return {
+        item.rsplit('-', 1)[0].lower()
+        for match in _INSTALLED_RE.finditer(output)
+        for item in match.group(1).split()
+    }
 
-        logger.error("✗ 所有ruamel.yaml版本安装都失败")
-        return False
 
-    def create_minimal_requirements(self) -> bool:
-        """创建最小化的requirements.txt文件"""
-        logger.info("创建最小化依赖配置...")
-
-        # 根据操作系统选择不同的依赖
-        if self.system_info['system'] == 'Windows':
-            # Windows上避免需要编译的包
-            minimal_requirements = """# 汽车电源测试框架 - 最小依赖配置（Windows优化版）
+# 最小依赖文件 requirements_minimal.txt（Windows上避免需要编译的包）
+_WINDOWS_REQUIREMENTS = """# 汽车电源测试框架 - 最小依赖配置（Windows优化版）
 # 测试框架核心
 pytest==7.4.0
 pytest-html==4.1.1
@@ -256,10 +109,10 @@ loguru==0.7.2
 
 # 可选：如果需要Allure报告
 # allure-pytest==2.13.0
-"""
-        else:
-            # Linux/macOS可以使用更多功能
-            minimal_requirements = """# 汽车电源测试框架 - 最小依赖配置
+""".encode("utf-8")
+
+# 最小依赖文件 requirements_minimal.txt（Linux/macOS）
+_POSIX_REQUIREMENTS = """# 汽车电源测试框架 - 最小依赖配置
 # 测试框架
 pytest==8.2.0
 pytest-xdist==3.6.1
@@ -278,81 +131,10 @@ numpy==1.26.4
 # 日志与工具
 loguru==0.7.2
 colorama==0.4.6
-"""
-
-        requirements_path = os.path.join(self.project_root, "requirements_minimal.txt")
-
-        try:
-            with open(requirements_path, "w", encoding="utf-8") as f:
-                f.write(minimal_requirements)
-
-            logger.info(f"✓ 已创建最小依赖文件: {requirements_path}")
-            return True
-        except Exception as e:
-            logger.error(f"✗ 创建requirements_minimal.txt失败: {e}")
-            return False
-
-    def install_minimal_requirements(self) -> bool:
-        """安装最小化依赖"""
-        logger.info("安装最小化依赖...")
-
-        requirements_file = "requirements_minimal.txt"
-
-        if not os.path.exists(requirements_file):
-            logger.error(f"✗ 找不到依赖文件: {requirements_file}")
-            return False
-
-        success, output = self.run_command(
-            f"{sys.executable} -m pip install -r {requirements_file}",
-            check=False
-        )
+""".encode("utf-8")
 
-        if success:
-            logger.info("✓ 最小依赖安装成功")
-        else:
-            logger.warning(f"⚠ 最小依赖安装可能有问题: {output[:500]}")
-
-        return success
-
-    def create_project_structure(self) -> bool:
-        """创建项目目录结构（如果不存在）"""
-        logger.info("检查/创建项目目录结构...")
-
-        directories = [
-            "config",
-            "src/drivers",
-            "src/common",
-            "src/system_under_test",
-            "tests/unit",
-            "tests/integration",
-            "tests/system",
-            "reports",
-            "logs"
-        ]
-
-        all_success = True
-
-        for directory in directories:
-            dir_path = os.path.join(self.project_root, directory)
-
-            try:
-                os.makedirs(dir_path, exist_ok=True)
-                logger.debug(f"目录已就绪: {directory}")
-
-                # 创建 __init__.py 文件
-                if directory.startswith("src/") or directory.startswith("tests/"):
-                    init_file = os.path.join(dir_path, "__init__.py")
-                    if not os.path.exists(init_file):
-                        with open(init_file, "w", encoding="utf-8") as f:
-                            f.write(f"# {directory} 模块\n")
-                        logger.debug(f"创建: {directory}/__init__.py")
-
-            except Exception as e:
-                logger.error(f"✗ 创建目录失败 {directory}: {e}")
-                all_success = False
-
-        # 创建配置文件示例
-        config_example = """# 汽车电源测试配置示例
+# 配置文件示例 config/parameters.yaml
+_CONFIG_EXAMPLE = """# 汽车电源测试配置示例
 default:
   description: "默认测试配置"
   instrument_setup:
@@ -365,26 +147,10 @@ default:
     over_voltage: 16.0
     over_current: 10.0
     over_temperature: 85.0
-"""
-
-        config_file = os.path.join(self.project_root, "config", "parameters.yaml")
-        if not os.path.exists(config_file):
-            try:
-                with open(config_file, "w", encoding="utf-8") as f:
-                    f.write(config_example)
-                logger.info(f"✓ 创建示例配置文件: config/parameters.yaml")
-            except Exception as e:
-                logger.error(f"✗ 创建配置文件失败: {e}")
-                all_success = False
+""".encode("utf-8")
 
-        logger.info("✓ 项目目录结构检查完成")
-        return all_success
-
-    def create_ruamel_config_loader(self) -> bool:
-        """创建ruamel.yaml配置加载器"""
-        logger.info("创建ruamel.yaml配置加载器...")
-
-        config_loader_code = '''"""
+# ruamel.yaml配置加载器 src/common/config_loader.py
+_CONFIG_LOADER_CODE = '''"""
 配置加载模块 - 使用ruamel.yaml
 """
 import os
@@ -511,52 +277,10 @@ def get_config_value(key_path: str, default: Any = None, config_file: str = "par
     """获取配置值的便捷函数"""
     config = _loader.load_config(config_file)
     return _loader.get_value(config, key_path, default)
-'''
-
-        # 确保src/common目录存在
-        common_dir = os.path.join(self.project_root, "src", "common")
-        os.makedirs(common_dir, exist_ok=True)
-
-        config_loader_path = os.path.join(common_dir, "config_loader.py")
+'''.encode("utf-8")
 
-        try:
-            with open(config_loader_path, "w", encoding="utf-8") as f:
-                f.write(config_loader_code)
-
-            logger.info(f"✓ 配置加载器已创建: {config_loader_path}")
-
-            # 测试配置加载器
-            test_code = '''
-import sys
-sys.path.insert(0, '.')
-from src.common.config_loader import load_config
-
-config = load_config()
-print("配置加载测试成功!")
-print(f"加载的配置键: {list(config.keys())}")
-'''
-
-            test_success, test_output = self.run_command(
-                f'{sys.executable} -c "{test_code}"',
-                check=False
-            )
-
-            if test_success:
-                logger.info("✓ 配置加载器测试通过")
-            else:
-                logger.warning(f"配置加载器测试失败: {test_output}")
-
-            return test_success
-
-        except Exception as e:
-            logger.error(f"✗ 创建配置加载器失败: {e}")
-            return False
-
-    def create_simple_test(self) -> bool:
-        """创建简单的测试用例"""
-        logger.info("创建简单测试用例...")
-
-        test_code = '''"""
+# 环境验证测试用例 tests/test_environment.py
+_ENVIRONMENT_TEST_CODE = '''"""
 简单测试用例 - 验证环境配置
 """
 import sys
@@ -605,32 +329,536 @@ if __name__ == "__main__":
     test_environment()
     test_config_loading()
     print("\\n✅ 所有测试通过!")
-'''
+'''.encode("utf-8")
+
+
+def _write_file(path: Union[str, Path], content: bytes) -> Optional[Exception]:
+    """写入单个文件（内容为已编码的UTF-8字节），返回发生的异常（成功时为None）"""
+    try:
+        Path(path).write_bytes(content)
+    except Exception as e:
+        return e
+    return None
+
 
-        test_file = os.path.join(self.project_root, "tests", "test_environment.py")
+def write_files(writes: List[Tuple[Union[str, Path], bytes]]) -> List[Tuple[Union[str, Path], Optional[Exception]]]:
+    """
+    并发写入一批互不相关的文件
+    返回与输入顺序一致的 (路径, 异常) 列表，成功时异常为None
+    """
+    if not writes:
+        return []
+
+    with ThreadPoolExecutor(max_workers=min(8, len(writes))) as executor:
+        errors = executor.map(lambda item: _write_file(*item), writes)
+        return [(path, error) for (path, _), error in zip(writes, errors)]
+
+
+class EnvironmentFixer:
+    """环境修复器类"""
+
+    # 项目目录结构
+    PROJECT_DIRECTORIES = (
+        "config",
+        "src/drivers",
+        "src/common",
+        "src/system_under_test",
+        "tests/unit",
+        "tests/integration",
+        "tests/system",
+        "reports",
+        "logs"
+    )
+
+    # 需要生成的文件：(分组, 相对路径, 内容, 已存在时是否覆盖)
+    FILE_TEMPLATES = (
+        *(("structure", f"{directory}/__init__.py", f"# {directory} 模块\n".encode("utf-8"), False)
+          for directory in PROJECT_DIRECTORIES if directory.startswith(("src/", "tests/"))),
+        ("structure", "config/parameters.yaml", _CONFIG_EXAMPLE, False),
+        ("config_loader", "src/common/config_loader.py", _CONFIG_LOADER_CODE, True),
+        ("simple_test", "tests/test_environment.py", _ENVIRONMENT_TEST_CODE, True),
+    )
+
+    # 修复步骤：(名称, 方法名, 依赖的步骤)
+    # pip相关步骤都会修改site-packages，按依赖链串行执行；文件生成步骤与其并行
+    FIX_STEPS = (
+        ("升级pip工具", "upgrade_pip_tools", ()),
+        ("清理PyYAML安装", "clean_pyyaml_installations", ("升级pip工具",)),
+        ("安装ruamel.yaml", "install_ruamel_yaml", ("清理PyYAML安装",)),
+        ("创建最小依赖配置", "create_minimal_requirements", ()),
+        ("安装最小依赖", "install_minimal_requirements", ("安装ruamel.yaml", "创建最小依赖配置")),
+        ("创建项目结构", "create_project_structure", ()),
+        # 配置加载器会在本进程中导入ruamel.yaml，必须等所有pip步骤结束（最小依赖会重装ruamel.yaml）
+        ("创建配置加载器", "create_ruamel_config_loader", ("安装最小依赖", "创建项目结构")),
+        ("创建测试用例", "create_simple_test", ()),
+        ("运行环境测试", "run_environment_test",
+         ("安装最小依赖", "创建配置加载器", "创建测试用例")),
+    )
+
+    # 在本进程中运行pytest的步骤：pytest会接管标准输出/错误并改动根日志记录器，
+    # 不与其他步骤并行，等并行步骤全部结束后在主线程中执行
+    MAIN_THREAD_STEPS = frozenset({"运行环境测试"})
+
+    def __init__(self, assume_yes: bool = False):
+        self.project_root = os.getcwd()
+        self.assume_yes = assume_yes
+        self.root = Path(self.project_root)
 
+        # pip使用项目内的本地缓存，重复运行时直接复用已下载/已构建的wheel
+        self.pip_cache_dir = self.root / ".pip-cache"
+        os.environ["PIP_CACHE_DIR"] = str(self.pip_cache_dir)
+        os.environ["PIP_DISABLE_PIP_VERSION_CHECK"] = "1"
+
+        # 网络探测结果（见 start_network_probe）
+        self._network_probe: Optional[threading.Thread] = None
+        self._network_ok = False
+
+        # 并行执行修复步骤时保护控制台上的步骤标题输出
+        self._print_lock = threading.Lock()
+
+        # 系统/Python信息在首次访问时计算（见 system_info / python_info）
+        self._system_info: Optional[Dict[str, Any]] = None
+        self._python_info: Optional[Dict[str, Any]] = None
+
+    @property
+    def system_info(self) -> Dict[str, Any]:
+        """
+        获取系统信息（首次访问时计算并缓存）
+        不查询 platform.version()/platform.processor()，它们在Windows上可能很慢且未被使用
+        """
+        if self._system_info is None:
+            self._system_info = {
+                "system": platform.system(),
+                "release": platform.release(),
+                "machine": platform.machine(),
+                "architecture": platform.architecture()[0]
+            }
+        return self._system_info
+
+    @property
+    def python_info(self) -> Dict[str, Any]:
+        """获取Python信息（首次访问时计算并缓存）"""
+        if self._python_info is None:
+            self._python_info = {
+                "version": sys.version,
+                "executable": sys.executable,
+                "platform": sys.platform,
+                "path": sys.path[:3]  # 只显示前3个路径
+            }
+        return self._python_info
+
+    def print_banner(self):
+        """打印横幅"""
+        print("\n" + "=" * 70)
+        print("汽车电源测试框架 - 环境诊断与修复工具")
+        print("=" * 70)
+        print(f"项目路径: {self.project_root}")
+        print(f"操作系统: {self.system_info['system']} {self.system_info['release']}")
+        print(f"Python路径: {self.python_info['executable']}")
+        print(f"Python版本: {sys.version.split()[0]}")
+        print("=" * 70 + "\n")
+
+    def check_virtual_env(self) -> bool:
+        """检查是否在虚拟环境中"""
+        # 标准venv与新版virtualenv只需比较前缀；旧版virtualenv会设置 sys.real_prefix
+        in_venv = sys.prefix != getattr(sys, 'base_prefix', sys.prefix) or hasattr(sys, 'real_prefix')
+
+        if in_venv:
+            logger.info("✓ 检测到虚拟环境")
+            return True
+        else:
+            logger.warning("⚠ 未检测到虚拟环境，建议在虚拟环境中运行")
+
+            # 一次扫描项目根目录，检查是否有常见的虚拟环境目录
+            try:
+                with os.scandir(self.root) as entries:
+                    dir_names = {entry.name for entry in entries if entry.is_dir()}
+            except OSError:
+                dir_names = set()
+
+            for venv_dir in ('venv', '.venv', 'env'):
+                if venv_dir in dir_names:
+                    logger.info(f"发现虚拟环境目录: {venv_dir}")
+
+                    # 检查激活脚本
+                    if self.system_info['system'] == 'Windows':
+                        activate_script = Path(venv_dir, 'Scripts', 'activate.bat')
+                    else:
+                        activate_script = Path(venv_dir, 'bin', 'activate')
+
+                    if (self.root / activate_script).exists():
+                        logger.info(f"虚拟环境激活脚本: {activate_script}")
+                        print(f"\n请先激活虚拟环境:")
+                        if self.system_info['system'] == 'Windows':
+                            print(f"  {venv_dir}\\Scripts\\activate")
+                        else:
+                            print(f"  source {venv_dir}/bin/activate")
+                        print("然后重新运行此脚本。\n")
+                        return False
+
+            # 非交互环境默认不在全局环境中安装（会卸载PyYAML并改动系统解释器），需要时用 --yes / ASSUME_YES 确认
+            return confirm("是否继续在全局环境中安装? (y/n): ", assume_yes=self.assume_yes)
+
+    def run_command(self, argv: List[str], check: bool = True, cwd: Optional[str] = None) -> Tuple[bool, str]:
+        """
+        运行命令行命令
+        argv 为参数列表，直接启动进程而不经过shell，无需处理引号转义
+        """
+        if cwd is None:
+            cwd = self.project_root
+
+        logger.debug(f"执行命令: {subprocess.list2cmdline(argv)}")
+        logger.debug(f"工作目录: {cwd}")
+
+        try:
+            # 合并stdout/stderr并逐行读取，只保留最后若干行，pip的大量输出不会整体驻留内存
+            with subprocess.Popen(
+                argv,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                cwd=cwd,
+                encoding='utf-8',
+                errors='ignore',
+                bufsize=1
+            ) as proc:
+                tail = deque(proc.stdout, maxlen=_OUTPUT_TAIL_LINES)
+                returncode = proc.wait()
+
+            output = "".join(tail)
+
+            if returncode != 0:
+                error_msg = f"命令执行失败 (返回码: {returncode}):\n"
+                if output:
+                    error_msg += f"命令输出:\n{output}"
+
+                logger.error(error_msg)
+
+                if check:
+                    return False, error_msg
+                else:
+                    return False, output
+            else:
+                logger.debug(f"命令输出: {output[:500]}")  # 只记录前500字符
+                return True, output
+
+        except Exception as e:
+            error_msg = f"执行命令时发生异常: {str(e)}"
+            logger.error(error_msg)
+            return False, error_msg
+
+    def _sentinel(self, name: str, payload: bytes) -> Path:
+        """
+        返回安装步骤的成功标记文件路径 .cache/<name>-<sha256>.ok
+        哈希覆盖当前解释器路径和 payload（如依赖文件内容），任一变化都会得到新的标记
+        """
+        digest = hashlib.sha256(os.fsencode(sys.executable) + b"\0" + payload).hexdigest()
+        return self.root / ".cache" / f"{name}-{digest}.ok"
+
+    @staticmethod
+    def _module_found(name: str) -> bool:
+        """在当前进程中查找模块（不实际导入）；上级包不存在时同样视为找不到"""
+        try:
+            return importlib.util.find_spec(name) is not None
+        except ImportError:
+            return False
+
+    @staticmethod
+    def _mark_done(sentinel: Path):
+        """写入成功标记；写入失败只影响下次能否跳过，不影响本次结果"""
+        try:
+            sentinel.parent.mkdir(exist_ok=True)
+            sentinel.touch()
+        except OSError as e:
+            logger.debug(f"无法写入标记文件 {sentinel}: {e}")
+
+    def upgrade_pip_tools(self) -> bool:
+        """升级pip、setuptools和wheel"""
+        logger.info("升级pip、setuptools和wheel...")
+
+        tools = ["pip", "setuptools", "wheel"]
+
+        # 一次pip调用升级全部工具
+        logger.info(f"正在升级 {' '.join(tools)}...")
+        success, output = self.run_command(
+            [sys.executable, "-m", "pip", "install", "--prefer-binary", "--upgrade", *tools],
+            check=False
+        )
+
+        if not success:
+            logger.warning(f"⚠ {', '.join(tools)} 升级可能有问题: {output[:200]}")
+            return False
+
+        upgraded = parse_installed_packages(output)
+        for tool in tools:
+            if tool in upgraded:
+                logger.info(f"✓ {tool} 升级成功")
+            else:
+                logger.info(f"✓ {tool} 已是最新版本")
+
+        return True
+
+    def clean_pyyaml_installations(self) -> bool:
+        """清理所有PyYAML安装"""
+        logger.info("清理现有的PyYAML安装...")
+
+        # 尝试卸载不同可能的大小写（pip按规范化包名去重，一次调用即可）
+        pyyaml_names = ["pyyaml", "PyYAML", "PyYaml"]
+
+        success, output = self.run_command(
+            [sys.executable, "-m", "pip", "uninstall", "-y", *pyyaml_names],
+            check=False
+        )
+
+        if "not installed" not in output:
+            logger.info(f"已尝试卸载: {', '.join(pyyaml_names)}")
+
+        # 检查是否还有残留（pip在子进程中修改了site-packages，需先刷新导入缓存）
+        importlib.invalidate_caches()
+        if importlib.util.find_spec("yaml") is not None:
+            logger.warning("PyYAML仍然存在，可能需要手动清理")
+            return False
+
+        logger.info("✓ PyYAML清理完成")
+        return True
+
+    def install_ruamel_yaml(self) -> bool:
+        """安装ruamel.yaml作为PyYAML的替代品"""
+        logger.info("安装ruamel.yaml...")
+
+        # 先安装最小依赖中固定的版本，之后安装最小依赖时不必再重装；
+        # 该版本装不上（如没有适用的wheel）时再让pip在0.17.x系列中选择
+        requirements = ["ruamel.yaml==0.17.21", "ruamel.yaml>=0.17,<0.18"]
+
+        # 以当前环境中实际安装的版本为准，环境被重建或包被卸载后会重新安装
+        version = installed_version("ruamel.yaml")
+        if version is not None and version.startswith("0.17.") and self._module_found("ruamel.yaml"):
+            logger.info(f"✓ ruamel.yaml {version} 已安装，跳过")
+            return True
+
+        for requirement in requirements:
+            logger.info(f"尝试安装: {requirement}")
+            success, output = self.run_command(
+                [sys.executable, "-m", "pip", "install", "--prefer-binary", requirement],
+                check=False
+            )
+            if success:
+                break
+
+        if not success:
+            logger.error(f"✗ ruamel.yaml 安装失败: {output[:200]}")
+            return False
+
+        logger.info("✓ ruamel.yaml 安装成功")
+
+        # 验证安装（在当前进程中查找模块，不实际导入）
+        importlib.invalidate_caches()
+        if not self._module_found("ruamel.yaml"):
+            logger.error("✗ ruamel.yaml 安装但无法找到模块")
+            return False
+
+        logger.info("✓ ruamel.yaml 模块检查成功")
+        return True
+
+    def create_minimal_requirements(self) -> bool:
+        """创建最小化的requirements.txt文件"""
+        logger.info("创建最小化依赖配置...")
+
+        # 根据操作系统选择不同的依赖
+        if self.system_info['system'] == 'Windows':
+            # Windows上避免需要编译的包
+            minimal_requirements = _WINDOWS_REQUIREMENTS
+        else:
+            # Linux/macOS可以使用更多功能
+            minimal_requirements = _POSIX_REQUIREMENTS
+
+        requirements_path = self.root / "requirements_minimal.txt"
+
+        try:
+            requirements_path.write_bytes(minimal_requirements)
+
+            logger.info(f"✓ 已创建最小依赖文件: {requirements_path}")
+            return True
+        except Exception as e:
+            logger.error(f"✗ 创建requirements_minimal.txt失败: {e}")
+            return False
+
+    def install_minimal_requirements(self) -> bool:
+        """安装最小化依赖"""
+        logger.info("安装最小化依赖...")
+
+        requirements_file = "requirements_minimal.txt"
+        requirements_path = self.root / requirements_file
+
+        if not requirements_path.exists():
+            logger.error(f"✗ 找不到依赖文件: {requirements_file}")
+            return False
+
+        # 依赖文件与上次成功安装时完全相同，且其中固定的版本确实都已安装在当前环境中，才跳过pip
+        requirements = requirements_path.read_bytes()
+        sentinel = self._sentinel("req", requirements)
+        if sentinel.exists() and pins_satisfied(requirements):
+            logger.info("✓ 最小依赖未变化且已全部安装，跳过")
+            return True
+
+        # Windows上只使用预编译wheel，避免源码包构建（PyYAML问题的根源）
+        binary_option = "--only-binary=:all:" if self.system_info['system'] == 'Windows' else "--prefer-binary"
+
+        success, output = self.run_command(
+            [sys.executable, "-m", "pip", "install", binary_option, "-r", requirements_file],
+            check=False
+        )
+
+        if success:
+            logger.info("✓ 最小依赖安装成功")
+            self._mark_done(sentinel)
+        else:
+            logger.warning(f"⚠ 最小依赖安装可能有问题: {output[:500]}")
+
+        return success
+
+    def _emit_templates(self, group: str) -> List[Tuple[str, Optional[Exception]]]:
+        """
+        生成 FILE_TEMPLATES 中指定分组的文件
+        每个父目录只创建一次；不覆盖的模板在文件已存在时跳过
+        返回 (相对路径, 异常) 列表，成功时异常为None
+        """
+        relpaths = []
+        writes = []
+        for tag, relpath, content, overwrite in self.FILE_TEMPLATES:
+            if tag != group:
+                continue
+            path = self.root / relpath
+            if overwrite or not path.exists():
+                relpaths.append(relpath)
+                writes.append((path, content))
+
+        for parent in {path.parent for path, _ in writes}:
+            try:
+                parent.mkdir(parents=True, exist_ok=True)
+            except OSError:
+                # 目录创建失败时，随后的写入会报告具体错误
+                pass
+
+        return [(relpath, error)
+                for relpath, (_, error) in zip(relpaths, write_files(writes))]
+
+    def create_project_structure(self) -> bool:
+        """创建项目目录结构（如果不存在）"""
+        logger.info("检查/创建项目目录结构...")
+
+        all_success = True
+
+        # 收集所有目录及其上级目录（如 src、tests），由浅到深每个只创建一次
+        directories = {
+            path
+            for directory in self.PROJECT_DIRECTORIES
+            for path in (Path(directory), *Path(directory).parents)
+            if path.parts
+        }
+
+        # 每个上级目录只列一次内容，重复运行时已存在的目录不再逐个mkdir
+        existing: Dict[Path, Set[str]] = {}
+
+        for directory in sorted(directories, key=lambda path: len(path.parts)):
+            parent = directory.parent
+            if parent not in existing:
+                try:
+                    with os.scandir(self.root / parent) as entries:
+                        existing[parent] = {entry.name for entry in entries if entry.is_dir()}
+                except OSError:
+                    existing[parent] = set()
+
+            if directory.name not in existing[parent]:
+                try:
+                    (self.root / directory).mkdir(exist_ok=True)
+                    existing[directory] = set()  # 新建的目录是空的，无需再列
+                except Exception as e:
+                    logger.error(f"✗ 创建目录失败 {directory.as_posix()}: {e}")
+                    all_success = False
+                    continue
+
+            logger.debug(f"目录已就绪: {directory.as_posix()}")
+
+        # 创建 __init__.py 文件和配置文件示例（已存在则跳过）
+        for relpath, error in self._emit_templates("structure"):
+            if error is None:
+                logger.info(f"✓ 已创建: {relpath}")
+            else:
+                logger.error(f"✗ 创建文件失败 {relpath}: {error}")
+                all_success = False
+
+        logger.info("✓ 项目目录结构检查完成")
+        return all_success
+
+    def create_ruamel_config_loader(self) -> bool:
+        """创建ruamel.yaml配置加载器"""
+        logger.info("创建ruamel.yaml配置加载器...")
+
+        (config_loader_path, error), = self._emit_templates("config_loader")
+        if error is not None:
+            logger.error(f"✗ 创建配置加载器失败: {error}")
+            return False
+
+        logger.info(f"✓ 配置加载器已创建: {config_loader_path}")
+
+        # 测试配置加载器：在当前进程中按文件路径加载模块，不修改sys.path
         try:
-            with open(test_file, "w", encoding="utf-8") as f:
-                f.write(test_code)
+            importlib.invalidate_caches()
+            spec = importlib.util.spec_from_file_location(
+                "_config_loader_selftest",
+                self.root / config_loader_path
+            )
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
 
-            logger.info(f"✓ 测试用例已创建: {test_file}")
+            config = module.load_config()
+            logger.info(f"✓ 配置加载器测试通过，加载的配置键: {list(config.keys())}")
             return True
+
         except Exception as e:
-            logger.error(f"✗ 创建测试用例失败: {e}")
+            logger.warning(f"配置加载器测试失败: {e}")
             return False
 
+    def create_simple_test(self) -> bool:
+        """创建简单的测试用例"""
+        logger.info("创建简单测试用例...")
+
+        (test_file, error), = self._emit_templates("simple_test")
+        if error is not None:
+            logger.error(f"✗ 创建测试用例失败: {error}")
+            return False
+
+        logger.info(f"✓ 测试用例已创建: {test_file}")
+        return True
+
     def run_environment_test(self) -> bool:
         """运行环境测试"""
         logger.info("运行环境测试...")
 
-        test_file = os.path.join(self.project_root, "tests", "test_environment.py")
+        test_file = self.root / "tests" / "test_environment.py"
 
-        if not os.path.exists(test_file):
+        if not test_file.exists():
             logger.error(f"✗ 测试文件不存在: {test_file}")
             return False
 
+        # pytest已安装时在当前进程中运行，省去再启动一个Python解释器
+        importlib.invalidate_caches()
+        try:
+            import pytest
+        except ImportError:
+            pytest = None
+
+        if pytest is not None:
+            exit_code = pytest.main(["-q", str(test_file)])
+            if exit_code == 0:
+                logger.info("✓ 环境测试通过")
+                return True
+            logger.error(f"✗ 环境测试失败 (pytest 返回码: {int(exit_code)})")
+            return False
+
         success, output = self.run_command(
-            f"{sys.executable} {test_file}",
+            [sys.executable, str(test_file)],
             check=False
         )
 
@@ -643,6 +871,30 @@ if __name__ == "__main__":
             logger.error(f"✗ 环境测试失败: {output}")
             return False
 
+    def _probe_network(self):
+        """
+        探测PyPI是否可达：只建立TCP连接，不做TLS握手和HTTP请求
+        pip经代理访问（HTTPS_PROXY、系统代理设置或 PIP_PROXY）时直连探测没有意义，直接视为可达
+        """
+        import urllib.request
+
+        proxies = urllib.request.getproxies()
+        if os.environ.get("PIP_PROXY") or (
+                (proxies.get("https") or proxies.get("all")) and not urllib.request.proxy_bypass("pypi.org")):
+            self._network_ok = True
+            return
+
+        try:
+            socket.create_connection(("pypi.org", 443), timeout=1.5).close()
+            self._network_ok = True
+        except OSError:
+            self._network_ok = False
+
+    def start_network_probe(self):
+        """在后台线程中探测网络，与其他检查步骤并行"""
+        self._network_probe = threading.Thread(target=self._probe_network, daemon=True)
+        self._network_probe.start()
+
     def diagnose_problems(self):
         """诊断常见问题"""
         logger.info("诊断环境问题...")
@@ -657,7 +909,7 @@ if __name__ == "__main__":
 
         # 检查pip版本
         success, output = self.run_command(
-            f"{sys.executable} -m pip --version",
+            [sys.executable, "-m", "pip", "--version"],
             check=False
         )
 
@@ -666,24 +918,19 @@ if __name__ == "__main__":
             solutions.append("运行: python -m ensurepip --upgrade")
 
         # 检查磁盘空间
-        if self.system_info['system'] == 'Windows':
-            import ctypes
-            free_bytes = ctypes.c_ulonglong(0)
-            ctypes.windll.kernel32.GetDiskFreeSpaceExW(
-                ctypes.c_wchar_p(self.project_root[:3]),
-                None, None, ctypes.pointer(free_bytes)
-            )
-            free_gb = free_bytes.value / (1024 ** 3)
+        free_gb = shutil.disk_usage(self.project_root).free / (1024 ** 3)
 
-            if free_gb < 1:
-                problems.append(f"磁盘空间不足（仅剩{free_gb:.1f}GB）")
-                solutions.append("清理磁盘空间，至少需要1GB空闲空间")
+        if free_gb < 1:
+            problems.append(f"磁盘空间不足（仅剩{free_gb:.1f}GB）")
+            solutions.append("清理磁盘空间，至少需要1GB空闲空间")
 
-        # 检查网络连接
-        try:
-            import urllib.request
-            urllib.request.urlopen("https://pypi.org", timeout=5)
-        except:
+        # 检查网络连接（run() 开始时已在后台发起探测，这里只等待结果）
+        if self._network_probe is None:
+            self._probe_network()
+        else:
+            self._network_probe.join()
+
+        if not self._network_ok:
             problems.append("网络连接可能有问题")
             solutions.append("检查网络连接，或使用国内镜像源: pip install -i https://pypi.tuna.tsinghua.edu.cn/simple")
 
@@ -700,8 +947,30 @@ if __name__ == "__main__":
 
         return len(problems) == 0
 
+    def _run_step(self, step_name: str, step_func) -> Tuple[bool, Optional[Exception]]:
+        """执行单个修复步骤，返回 (是否成功, 异常)；步骤标题与结果的输出由锁保护"""
+        with self._print_lock:
+            print(f"\n{'=' * 50}")
+            print(f"步骤: {step_name}")
+            print(f"{'=' * 50}")
+
+        try:
+            success = step_func()
+        except Exception as e:
+            with self._print_lock:
+                print(f"✗ {step_name} 异常: {e}")
+            return False, e
+
+        with self._print_lock:
+            if success:
+                print(f"✓ {step_name} 完成")
+            else:
+                print(f"⚠ {step_name} 可能有问题")
+        return bool(success), None
+
     def run(self) -> bool:
         """运行修复流程"""
+        self.start_network_probe()
         self.print_banner()
 
         # 检查虚拟环境
@@ -713,45 +982,52 @@ if __name__ == "__main__":
 
         print("\n开始修复流程...")
 
-        steps = [
-            ("升级pip工具", self.upgrade_pip_tools),
-            ("清理PyYAML安装", self.clean_pyyaml_installations),
-            ("安装ruamel.yaml", self.install_ruamel_yaml),
-            ("创建最小依赖配置", self.create_minimal_requirements),
-            ("安装最小依赖", self.install_minimal_requirements),
-            ("创建项目结构", self.create_project_structure),
-            ("创建配置加载器", self.create_ruamel_config_loader),
-            ("创建测试用例", self.create_simple_test),
-            ("运行环境测试", self.run_environment_test)
-        ]
-
         all_success = True
         failed_steps = []
+        aborted = False
+
+        # 依赖全部完成的步骤立即提交；询问是否继续始终在主线程中进行
+        pending = {name: (getattr(self, method), set(deps)) for name, method, deps in self.FIX_STEPS
+                   if name not in self.MAIN_THREAD_STEPS}
+        done = set()
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            while running or (pending and not aborted):
+                if not aborted:
+                    for step_name in [name for name, (_, deps) in pending.items() if deps <= done]:
+                        step_func, _ = pending.pop(step_name)
+                        running[executor.submit(self._run_step, step_name, step_func)] = step_name
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    step_name = running.pop(future)
+                    done.add(step_name)
+
+                    success, error = future.result()
+                    if success:
+                        continue
 
-        for step_name, step_func in steps:
-            print(f"\n{'=' * 50}")
-            print(f"步骤: {step_name}")
-            print(f"{'=' * 50}")
-
-            try:
-                success = step_func()
-                if success:
-                    print(f"✓ {step_name} 完成")
-                else:
-                    print(f"⚠ {step_name} 可能有问题")
                     all_success = False
                     failed_steps.append(step_name)
 
-                    # 询问是否继续
-                    if step_name not in ["运行环境测试", "创建测试用例"]:
-                        response = input(f"\n{step_name} 可能失败，是否继续? (y/n): ")
-                        if response.lower() != 'y':
-                            print("用户选择中止")
-                            return False
-            except Exception as e:
-                print(f"✗ {step_name} 异常: {e}")
-                all_success = False
-                failed_steps.append(step_name)
+                    # 询问是否继续（步骤抛出异常时直接继续，与原流程一致）
+                    if error is None and not aborted and step_name not in ["运行环境测试", "创建测试用例"]:
+                        # 非交互环境默认继续，以便一次收集所有失败的步骤（退出码仍为失败）
+                        if not confirm(f"\n{step_name} 可能失败，是否继续? (y/n): ",
+                                       assume_yes=self.assume_yes, default=True):
+                            print("用户选择中止，等待正在执行的步骤结束...")
+                            aborted = True
+
+        if aborted:
+            return False
+
+        for step_name, method, _ in self.FIX_STEPS:
+            if step_name in self.MAIN_THREAD_STEPS:
+                success, _ = self._run_step(step_name, getattr(self, method))
+                if not success:
+                    all_success = False
+                    failed_steps.append(step_name)
 
         # 输出总结
         print("\n" + "=" * 70)
@@ -777,15 +1053,35 @@ if __name__ == "__main__":
             print("\n手动安装命令:")
             print(f"  {sys.executable} -m pip install ruamel.yaml pytest")
 
-        print(f"\n详细日志已保存到: {os.path.join(self.project_root, 'environment_fix.log')}")
+        print(f"\n详细日志已保存到: {self.root / 'environment_fix.log'}")
         print("=" * 70)
 
         return all_success
 
 
-def main():
+def main(argv=None):
     """主函数"""
-    fixer = EnvironmentFixer()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="汽车电源测试框架 - 环境修复脚本")
+    parser.add_argument("-y", "--yes", action="store_true",
+                        help="不询问，所有确认都选择继续（也可设置环境变量 ASSUME_YES=1）")
+    args = parser.parse_args(argv)
+    assume_yes = args.yes or bool(os.environ.get("ASSUME_YES"))
+
+    # 检查是否在项目根目录
+    current_dir = os.getcwd()
+    if not Path("requirements.txt").exists() and not Path("src").exists():
+        print(f"警告: 当前目录可能不是项目根目录")
+        print(f"当前目录: {current_dir}")
+        print(f"建议在包含 requirements.txt 或 src/ 目录的文件夹中运行")
+
+        # 非交互环境默认退出，避免在错误的目录中生成项目文件
+        if not confirm("是否继续? (y/n): ", assume_yes=assume_yes):
+            print("退出")
+            return 1
+
+    fixer = EnvironmentFixer(assume_yes=assume_yes)
 
     try:
         success = fixer.run()
@@ -801,16 +1097,4 @@ def main():
 
 
 if __name__ == "__main__":
-    # 检查是否在项目根目录
-    current_dir = os.getcwd()
-    if not os.path.exists("requirements.txt") and not os.path.exists("src"):
-        print(f"警告: 当前目录可能不是项目根目录")
-        print(f"当前目录: {current_dir}")
-        print(f"建议在包含 requirements.txt 或 src/ 目录的文件夹中运行")
-
-        response = input("是否继续? (y/n): ")
-        if response.lower() != 'y':
-            print("退出")
-            sys.exit(1)
-
     sys.exit(main())
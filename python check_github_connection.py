@@ -4,24 +4,63 @@ GitHub连接诊断工具
 用于诊断和解决Git推送失败的网络连接问题
 """
 import os
+import re
 import sys
 import subprocess
 import socket
-import urllib.request
-import time
 from datetime import datetime
-import json
+from pathlib import Path
+
+# urllib.request / concurrent.futures / json / argparse 只在实际用到的函数内导入，
+# 缩短启动时间（如 --help 时不需要加载这些模块）
+
+# 代理相关的环境变量（http_proxy / https_proxy，不区分大小写）
+_PROXY_ENV_RE = re.compile(r'https?_proxy', re.I)
 
 
 class GitHubConnectionDiagnoser:
     """GitHub连接诊断器"""
 
-    def __init__(self, github_username="menglijiang", repo_name="car_power_auto_platform"):
+    def __init__(self, github_username="menglijiang", repo_name="car_power_auto_platform", project_path=None):
         self.github_username = github_username
+        # 所有git命令通过 cwd= 在项目目录中执行，不依赖（也不修改）进程的当前目录
+        self.project_path = str(project_path) if project_path is not None else os.getcwd()
         self.repo_name = repo_name
         self.https_url = f"https://github.com/{github_username}/{repo_name}.git"
         self.ssh_url = f"git@github.com:{github_username}/{repo_name}.git"
         self.diagnosis_results = {}
+        self._git_config_cache = None
+        self._probe_results = None
+
+    def _load_git_config(self):
+        """
+        一次性读取全部Git配置（git config --list -z）并缓存
+        返回 {键: 值} 字典，多值配置与 git config --get 一样取最后一个；读取失败返回None
+        """
+        if self._git_config_cache is None:
+            try:
+                result = subprocess.run(
+                    ["git", "config", "--list", "-z"],
+                    cwd=self.project_path,
+                    capture_output=True,
+                    text=True,
+                    timeout=5
+                )
+            except (OSError, subprocess.SubprocessError):
+                return None
+
+            if result.returncode != 0:
+                return None
+
+            config = {}
+            # 每条记录为 "键\n值"，记录之间以NUL分隔；没有值的键不含换行
+            for record in result.stdout.split('\0'):
+                if record:
+                    key, _, value = record.partition('\n')
+                    config[key] = value
+            self._git_config_cache = config
+
+        return self._git_config_cache
 
     def run_test(self, test_name, test_func):
         """运行测试并记录结果"""
@@ -44,52 +83,91 @@ class GitHubConnectionDiagnoser:
             print(f"❌ 错误: {e}")
             return False
 
+    @staticmethod
+    def _probe_dns():
+        """DNS解析github.com"""
+        try:
+            socket.gethostbyname("github.com")
+            return True
+        except OSError:
+            return False
+
+    @staticmethod
+    def _probe_http():
+        """HTTP访问百度，检查互联网连接"""
+        import urllib.request
+
+        try:
+            with urllib.request.urlopen("http://www.baidu.com", timeout=5) as response:
+                return response.status == 200
+        except Exception:
+            return False
+
+    @staticmethod
+    def _probe_tcp(host, port):
+        """TCP连接指定端口"""
+        try:
+            with socket.create_connection((host, port), timeout=5):
+                return True
+        except OSError:
+            return False
+
+    def _run_probes_parallel(self):
+        """
+        并行执行全部网络探测并缓存结果
+        总耗时取决于最慢的一项，而不是各项超时之和
+        """
+        if self._probe_results is None:
+            from concurrent.futures import ThreadPoolExecutor
+
+            probes = {
+                "dns": (self._probe_dns,),
+                "http": (self._probe_http,),
+                "https_port": (self._probe_tcp, "github.com", 443),
+                "ssh_port": (self._probe_tcp, "github.com", 22),
+            }
+            with ThreadPoolExecutor(max_workers=len(probes)) as executor:
+                futures = {name: executor.submit(*call) for name, call in probes.items()}
+            self._probe_results = {name: future.result() for name, future in futures.items()}
+
+        return self._probe_results
+
     def test_network_connectivity(self):
         """测试基本网络连接"""
         print("1. 测试互联网连接...")
-        try:
-            # 测试DNS解析
-            socket.gethostbyname("github.com")
+        probes = self._run_probes_parallel()
+
+        # 测试DNS解析
+        if probes["dns"]:
             print("   ✓ DNS解析正常")
-        except socket.gaierror:
+        else:
             print("   ✗ DNS解析失败")
             return False
 
         # 测试HTTP连接
-        try:
-            response = urllib.request.urlopen("http://www.baidu.com", timeout=5)
-            if response.status == 200:
-                print("   ✓ 互联网访问正常")
-                return True
-        except:
-            print("   ✗ 互联网访问失败")
+        if probes["http"]:
+            print("   ✓ 互联网访问正常")
+            return True
 
+        print("   ✗ 互联网访问失败")
         return False
 
     def test_github_connection(self):
         """测试GitHub连接"""
         print("2. 测试GitHub连接...")
+        probes = self._run_probes_parallel()
 
         # 测试HTTPS端口
-        test_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        test_socket.settimeout(5)
-
-        try:
-            test_socket.connect(("github.com", 443))
+        if probes["https_port"]:
             print("   ✓ GitHub HTTPS端口(443)可访问")
-            test_socket.close()
-        except:
+        else:
             print("   ✗ GitHub HTTPS端口(443)无法访问")
             return False
 
         # 测试SSH端口
-        try:
-            test_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            test_socket.settimeout(5)
-            test_socket.connect(("github.com", 22))
+        if probes["ssh_port"]:
             print("   ✓ GitHub SSH端口(22)可访问")
-            test_socket.close()
-        except:
+        else:
             print("   ✗ GitHub SSH端口(22)无法访问")
 
         return True
@@ -104,25 +182,19 @@ class GitHubConnectionDiagnoser:
             ("remote.origin.url", "远程仓库URL"),
         ]
 
+        config = self._load_git_config()
+        if config is None:
+            print("   ✗ 读取Git配置失败")
+            return False
+
         all_passed = True
 
         for config_key, description in config_checks:
-            try:
-                result = subprocess.run(
-                    ["git", "config", "--get", config_key],
-                    capture_output=True,
-                    text=True,
-                    timeout=5
-                )
-
-                if result.returncode == 0:
-                    value = result.stdout.strip()
-                    print(f"   ✓ {description}: {value}")
-                else:
-                    print(f"   ✗ {description}: 未配置")
-                    all_passed = False
-            except:
-                print(f"   ✗ 检查{description}失败")
+            value = config.get(config_key)
+            if value is not None:
+                print(f"   ✓ {description}: {value.strip()}")
+            else:
+                print(f"   ✗ {description}: 未配置")
                 all_passed = False
 
         return all_passed
@@ -131,33 +203,33 @@ class GitHubConnectionDiagnoser:
         """测试远程仓库配置"""
         print("4. 检查远程仓库...")
 
-        try:
-            # 检查远程仓库列表
-            result = subprocess.run(
-                ["git", "remote", "-v"],
-                capture_output=True,
-                text=True,
-                timeout=5
-            )
-
-            if result.returncode == 0:
-                print("   远程仓库配置:")
-                for line in result.stdout.strip().split('\n'):
-                    if line:
-                        print(f"     {line}")
-
-                # 检查特定远程仓库
-                if "origin" in result.stdout:
-                    return True
-                else:
-                    print("   ✗ 未找到origin远程仓库")
-                    return False
-            else:
-                print("   ✗ 获取远程仓库失败")
-                return False
+        # 远程仓库就是 remote.<name>.url / remote.<name>.pushurl 配置项，
+        # 复用已读取的Git配置，不再单独执行 git remote -v
+        config = self._load_git_config()
+        if config is None:
+            print("   ✗ 获取远程仓库失败")
+            return False
 
-        except Exception as e:
-            print(f"   ✗ 检查远程仓库失败: {e}")
+        remotes = {}
+        for key, value in config.items():
+            section, _, rest = key.partition('.')
+            name, _, option = rest.rpartition('.')
+            if section == "remote" and name and option in ("url", "pushurl"):
+                remotes.setdefault(name, {})[option] = value.strip()
+
+        print("   远程仓库配置:")
+        for name, urls in remotes.items():
+            if "url" in urls:
+                print(f"     {name}\t{urls['url']} (fetch)")
+            push_url = urls.get("pushurl", urls.get("url"))
+            if push_url is not None:
+                print(f"     {name}\t{push_url} (push)")
+
+        # 检查特定远程仓库
+        if "origin" in remotes:
+            return True
+        else:
+            print("   ✗ 未找到origin远程仓库")
             return False
 
     def test_git_push(self, use_ssh=False):
@@ -168,6 +240,7 @@ class GitHubConnectionDiagnoser:
         try:
             fetch_result = subprocess.run(
                 ["git", "fetch", "--dry-run"],
+                cwd=self.project_path,
                 capture_output=True,
                 text=True,
                 timeout=10
@@ -191,31 +264,23 @@ class GitHubConnectionDiagnoser:
         """检查代理设置"""
         print("6. 检查代理设置...")
 
-        env_vars = ["http_proxy", "https_proxy", "HTTP_PROXY", "HTTPS_PROXY"]
         git_configs = ["http.proxy", "https.proxy"]
 
         has_proxy = False
 
         # 检查环境变量
-        for var in env_vars:
-            value = os.environ.get(var)
-            if value:
+        for var, value in sorted(os.environ.items()):
+            if value and _PROXY_ENV_RE.fullmatch(var):
                 print(f"   环境变量 {var}: {value}")
                 has_proxy = True
 
         # 检查Git配置
+        git_config = self._load_git_config() or {}
         for config in git_configs:
-            try:
-                result = subprocess.run(
-                    ["git", "config", "--get", config],
-                    capture_output=True,
-                    text=True
-                )
-                if result.returncode == 0:
-                    print(f"   Git配置 {config}: {result.stdout.strip()}")
-                    has_proxy = True
-            except:
-                pass
+            value = git_config.get(config)
+            if value is not None:
+                print(f"   Git配置 {config}: {value.strip()}")
+                has_proxy = True
 
         if not has_proxy:
             print("   未检测到代理设置")
@@ -311,14 +376,16 @@ class GitHubConnectionDiagnoser:
 def main():
     """主函数"""
     import argparse
+    import json
 
     parser = argparse.ArgumentParser(description="GitHub连接诊断工具")
     parser.add_argument("--username", default="menglijiang", help="GitHub用户名")
     parser.add_argument("--repo", default="car_power_auto_platform", help="仓库名称")
+    parser.add_argument("--path", default=None, help="项目目录（默认为当前目录）")
 
     args = parser.parse_args()
 
-    diagnoser = GitHubConnectionDiagnoser(args.username, args.repo)
+    diagnoser = GitHubConnectionDiagnoser(args.username, args.repo, args.path)
 
     # 运行诊断
     diagnosis_passed = diagnoser.diagnose_connection_issue()
@@ -327,9 +394,8 @@ def main():
     report = diagnoser.generate_report()
 
     # 保存报告
-    report_file = "github_connection_report.json"
-    with open(report_file, 'w', encoding='utf-8') as f:
-        json.dump(report, f, indent=2, ensure_ascii=False)
+    report_file = Path(diagnoser.project_path) / "github_connection_report.json"
+    report_file.write_bytes(json.dumps(report, indent=2, ensure_ascii=False).encode("utf-8"))
     print(f"\n📄 诊断报告已保存到: {report_file}")
 
     # 显示解决方案
@@ -338,7 +404,7 @@ def main():
     # 最终状态
     print("\n" + "=" * 60)
     print("当前Git状态:")
-    subprocess.run(["git", "status"], timeout=5)
+    subprocess.run(["git", "status"], cwd=diagnoser.project_path, timeout=5)
     print("\n" + "=" * 60)
 
     if diagnosis_passed:
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+汽车电源测试 - 脚本公共工具
+check_dependencies / backup_manager / fix_car_power_environment / setup_git_repo 共用的
+备份文件扫描、清理、输出与交互确认函数
+"""
+import os
+import re
+import sys
+from datetime import datetime
+from operator import itemgetter
+from typing import List, Tuple
+
+# 备份文件名：requirements_backup_YYYYMMDD_HHMMSS.txt
+_BACKUP_RE = re.compile(r'^requirements_backup_([0-9]{8}_[0-9]{6})\.txt$')
+
+
+def scan_backups(dirpath) -> List[Tuple[str, str, os.DirEntry]]:
+    """
+    单次扫描目录，返回其中备份文件的 (时间戳, 文件名, 目录条目) 列表（未排序）
+    目录条目可直接复用scandir缓存的stat信息
+    """
+    with os.scandir(dirpath) as entries:
+        return [(m.group(1), entry.name, entry)
+                for entry, m in ((entry, _BACKUP_RE.match(entry.name)) for entry in entries) if m]
+
+
+def sort_backups(backup_files: List[Tuple[str, str, os.DirEntry]]) -> None:
+    """按文件名时间戳原地排序（最新的在前）；定长时间戳字符串按字典序即为时间顺序"""
+    backup_files.sort(key=itemgetter(0), reverse=True)
+
+
+def list_backups(dirpath) -> List[Tuple[str, str, os.DirEntry]]:
+    """列出目录中的备份文件，返回按时间戳排序（最新的在前）的 (时间戳, 文件名, 目录条目) 列表"""
+    backup_files = scan_backups(dirpath)
+    sort_backups(backup_files)
+    return backup_files
+
+
+def format_timestamp(timestamp_str: str) -> str:
+    """将 YYYYMMDD_HHMMSS 格式化为显示用的时间字符串"""
+    try:
+        return datetime.strptime(timestamp_str, "%Y%m%d_%H%M%S").strftime('%Y-%m-%d %H:%M:%S')
+    except ValueError:
+        return "未知时间"
+
+
+def unlink_in_dir(dirpath, names):
+    """
+    删除目录中的指定文件，逐个产出 (文件名, 错误)，删除成功时错误为None
+    支持dir_fd的平台上只打开一次目录，按文件名相对删除，避免每次解析完整路径
+    """
+    if os.unlink not in os.supports_dir_fd:
+        for name in names:
+            try:
+                os.unlink(os.path.join(dirpath, name))
+            except OSError as e:
+                yield name, e
+            else:
+                yield name, None
+        return
+
+    dir_fd = os.open(dirpath, os.O_RDONLY | getattr(os, "O_DIRECTORY", 0))
+    try:
+        for name in names:
+            try:
+                os.unlink(name, dir_fd=dir_fd)
+            except OSError as e:
+                yield name, e
+            else:
+                yield name, None
+    finally:
+        os.close(dir_fd)
+
+
+def emit_lines(lines: List[str]) -> None:
+    """一次写出整段输出，代替逐行print"""
+    sys.stdout.write("\n".join(lines) + "\n")
+
+
+def confirm(prompt: str, assume_yes: bool = False, default: bool = False) -> bool:
+    """
+    询问用户是否继续
+    assume_yes 为真时直接确认；标准输入不是终端（如CI环境）时不阻塞等待，直接按 default 处理；
+    直接回车同样按 default 处理
+    """
+    if assume_yes:
+        return True
+    if not sys.stdin.isatty():
+        print(f"{prompt}{'y' if default else 'n'}（非交互模式，使用默认选择）")
+        return default
+    answer = input(prompt).strip().lower()
+    if not answer:
+        return default
+    return answer in ('y', 'yes')
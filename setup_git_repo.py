@@ -7,13 +7,17 @@
 import os
 import sys
 import subprocess
+import threading
 import time
-import json
-import argparse
 import re
 from pathlib import Path
+from concurrent.futures import Future
 from datetime import datetime
-from typing import Tuple, Dict, Optional
+from typing import Tuple, Dict, List, Optional, Union
+
+from script_utils import confirm
+
+# json / random / socket / urllib.parse 只在实际用到的函数内导入，缩短启动时间
 
 
 class Colors:
@@ -26,38 +30,109 @@ class Colors:
     RESET = '\033[0m'
 
 
+# 输出不是终端（重定向到文件/管道）或设置了 NO_COLOR（https://no-color.org）时不输出颜色码
+if os.environ.get("NO_COLOR") or not (sys.stdout is not None and sys.stdout.isatty()):
+    for _name in ("GREEN", "YELLOW", "RED", "BLUE", "CYAN", "RESET"):
+        setattr(Colors, _name, "")
+    del _name
+
+
+# 各类消息的前缀（颜色 + 图标）和结尾，模块加载时拼好
+_SUCCESS_PREFIX = f"{Colors.GREEN}✅ "
+_ERROR_PREFIX = f"{Colors.RED}❌ "
+_WARNING_PREFIX = f"{Colors.YELLOW}⚠️  "
+_INFO_PREFIX = f"{Colors.BLUE}ℹ️  "
+_STEP_PREFIX = f"\n{Colors.CYAN}[步骤 "
+_SUFFIX = Colors.RESET
+
+
 def print_success(msg: str):
-    print(f"{Colors.GREEN}✅ {msg}{Colors.RESET}")
+    print(_SUCCESS_PREFIX, msg, _SUFFIX, sep='')
 
 
 def print_error(msg: str):
-    print(f"{Colors.RED}❌ {msg}{Colors.RESET}")
+    print(_ERROR_PREFIX, msg, _SUFFIX, sep='')
 
 
 def print_warning(msg: str):
-    print(f"{Colors.YELLOW}⚠️  {msg}{Colors.RESET}")
+    print(_WARNING_PREFIX, msg, _SUFFIX, sep='')
 
 
 def print_info(msg: str):
-    print(f"{Colors.BLUE}ℹ️  {msg}{Colors.RESET}")
+    print(_INFO_PREFIX, msg, _SUFFIX, sep='')
 
 
 def print_step(step_num: int, total_steps: int, description: str):
-    print(f"\n{Colors.CYAN}[步骤 {step_num}/{total_steps}] {description}{Colors.RESET}")
+    # 立即刷新，输出被重定向（块缓冲）时也能在git命令执行期间看到当前步骤
+    print(f"{_STEP_PREFIX}{step_num}/{total_steps}] {description}{_SUFFIX}", flush=True)
+
+
+# 只读的git查询命令：短时间内重复执行时直接复用上次的结果
+_READ_ONLY_COMMANDS = frozenset({
+    ("git", "--version"),
+    ("git", "config", "--list", "-z"),
+    ("git", "config", "--global", "--list", "-z"),
+})
+_READ_ONLY_CACHE_TTL = 2.0  # 秒
+
+# (命令, 工作目录) -> (执行时间, 结果)
+_read_only_cache: Dict[Tuple[Tuple[str, ...], Optional[str]], Tuple[float, Tuple[bool, str]]] = {}
+
+
+def run_command(argv: List[str], cwd: str = None, show_output: bool = False,
+                timeout: int = 30) -> Tuple[bool, str]:
+    """
+    运行命令并返回结果
+    argv 为参数列表，直接启动进程而不经过shell，参数中的引号和中文无需转义
+    只读git查询的结果缓存 _READ_ONLY_CACHE_TTL 秒；其他命令可能修改仓库，执行前清空缓存
+    """
+    cmd = tuple(argv)
+    if cmd not in _READ_ONLY_COMMANDS:
+        _read_only_cache.clear()
+        return _run_command(argv, cwd, show_output, timeout)
+
+    key = (cmd, cwd)
+    cached = _read_only_cache.get(key)
+    if cached is not None and time.monotonic() - cached[0] < _READ_ONLY_CACHE_TTL:
+        return cached[1]
+
+    result = _run_command(argv, cwd, show_output, timeout)
+    _read_only_cache[key] = (time.monotonic(), result)
+    return result
+
+
+def git_config_snapshot(project_path: str = None, global_only: bool = False) -> Dict[str, str]:
+    """
+    一次读取当前可见的全部Git配置（git config --list -z），返回 {键: 值}
+    origin地址、代理设置等都从这一份结果中查找，不再分别启动git；结果随 run_command 缓存
+    global_only 为真时只读取全局配置（--global）
+    同一个键有多个值时与 git config --get 一样取最后一个
+    """
+    argv = ["git", "config", "--global", "--list", "-z"] if global_only else ["git", "config", "--list", "-z"]
+    success, output = run_command(argv, project_path)
+    if not success:
+        return {}
+
+    config = {}
+    # 每条记录为 "键\n值"，记录之间以NUL分隔；没有值的键不含换行
+    for record in output.split('\0'):
+        if record:
+            key, _, value = record.partition('\n')
+            config[key] = value
+    return config
 
 
-def run_command(cmd: str, cwd: str = None, show_output: bool = False) -> Tuple[bool, str]:
-    """运行命令并返回结果"""
+def _run_command(argv: List[str], cwd: str = None, show_output: bool = False,
+                 timeout: int = 30) -> Tuple[bool, str]:
+    """实际执行命令"""
     try:
-        result = subprocess.run(
-            cmd, shell=True, cwd=cwd, capture_output=True, text=True,
-            encoding='utf-8', errors='replace', timeout=30
-        )
+        result = subprocess.run(argv, cwd=cwd, capture_output=True, timeout=timeout)
         success = result.returncode == 0
-        output = result.stdout.strip() or result.stderr.strip()
+        # 以字节形式读取，只解码最终返回的那一路输出（stdout为空时才用stderr）
+        output = (result.stdout.strip() or result.stderr.strip()).decode('utf-8', errors='replace')
 
         if show_output and output and not success:
-            for line in output.split('\n')[:3]:
+            for line in output.split('\n', 3)[:3]:
                 if line.strip():
                     print(f"    {line}")
 
@@ -66,15 +141,52 @@ def run_command(cmd: str, cwd: str = None, show_output: bool = False) -> Tuple[b
         return False, str(e)
 
 
+def configure_git_user(project_path: Path, username: str) -> bool:
+    """配置仓库级的 user.name 和 user.email"""
+    email = f"{username}@users.noreply.github.com"
+    name_success, _ = run_command(["git", "config", "user.name", username], str(project_path))
+    email_success, _ = run_command(["git", "config", "user.email", email], str(project_path))
+    return name_success and email_success
+
+
+# 提交信息
+_DEFAULT_COMMIT_MESSAGE = "汽车电源测试框架代码更新"
+_MERGE_COMMIT_MESSAGE = "合并远程更改\n".encode("utf-8")
+
+
+def git_commit(message: Union[str, bytes], cwd: str = None) -> Tuple[bool, str]:
+    """
+    提交暂存区的更改，提交信息（UTF-8）通过标准输入传给 git commit -F -，不经过shell转义
+    message 可以是已编码的字节，直接写入标准输入
+    """
+    if isinstance(message, str):
+        message = message.encode("utf-8")
+
+    _read_only_cache.clear()
+    try:
+        result = subprocess.run(
+            ["git", "commit", "-F", "-"], cwd=cwd, input=message, capture_output=True, timeout=30
+        )
+        output = result.stdout.strip() or result.stderr.strip()
+        return result.returncode == 0, output.decode('utf-8', errors='replace')
+    except Exception as e:
+        return False, str(e)
+
+
 def detect_git_config():
     """检测现有的Git配置"""
     config = {}
-    success, name = run_command("git config --global user.name")
-    if success and name:
-        config["username"] = name.strip()
+    name = git_config_snapshot(global_only=True).get("user.name", "").strip()
+    if name:
+        config["username"] = name
     return config
 
 
+# GitHub用户名：字母数字开头，连字符不能连续或结尾，最多39字符
+# 用 \Z 而不是 $，末尾带换行的输入不会被当作合法
+_GITHUB_USERNAME_RE = re.compile(r'[a-zA-Z0-9](?:[a-zA-Z0-9]|-(?=[a-zA-Z0-9])){0,38}\Z')
+
+
 def validate_github_username(username: str) -> Tuple[bool, str]:
     """验证GitHub用户名 - 修复版"""
     if not username or not username.strip():
@@ -87,15 +199,24 @@ def validate_github_username(username: str) -> Tuple[bool, str]:
         return False, "GitHub用户名过长（最多39字符）"
 
     # GitHub实际允许纯数字用户名（如用户ID），但建议使用字母数字组合
-    pattern = r'^[a-zA-Z0-9](?:[a-zA-Z0-9]|-(?=[a-zA-Z0-9])){0,38}$'
-    if not re.match(pattern, username):
+    if not _GITHUB_USERNAME_RE.match(username):
         return False, "用户名包含无效字符（只能包含字母、数字和连字符）"
 
     return True, ""
 
 
-def get_github_username():
-    """获取GitHub用户名，提供清晰指引"""
+def get_github_username(preset: Optional[str] = None) -> Optional[str]:
+    """
+    获取GitHub用户名，提供清晰指引
+    preset 为命令行参数或环境变量给出的用户名，校验通过直接使用，无效时返回None
+    """
+    if preset:
+        valid, msg = validate_github_username(preset)
+        if valid:
+            return preset.strip()
+        print_error(f"用户名无效: {msg}")
+        return None
+
     # 检测现有配置
     git_config = detect_git_config()
     if "username" in git_config:
@@ -105,8 +226,7 @@ def get_github_username():
         # 验证当前用户
         valid, msg = validate_github_username(current_user)
         if valid:
-            use_current = input(f"使用当前用户 '{current_user}'? (Y/n): ").strip().lower()
-            if use_current in ['', 'y', 'yes']:
+            if confirm(f"使用当前用户 '{current_user}'? (Y/n): ", default=True):
                 return current_user
 
     while True:
@@ -123,48 +243,33 @@ def get_github_username():
             print_info("提示: 使用您在GitHub.com上显示的用户名")
 
 
-def check_remote_repo_exists(remote_url: str) -> bool:
-    """检查远程仓库是否存在"""
-    success, _ = run_command(f"git ls-remote {remote_url} HEAD", timeout=10)
-    return success
-
-
-def smart_setup_remote(project_path: str, remote_url: str, repo_name: str, username: str) -> bool:
-    """智能设置远程仓库"""
+def smart_setup_remote(project_path: str, remote_url: str) -> bool:
+    """
+    智能设置远程仓库
+    不预先用 git ls-remote 探测远程仓库是否存在：仓库不存在时由推送步骤根据git的错误输出给出提示
+    """
     print_info("检查远程配置...")
 
     # 检查是否已配置
-    check_success, check_output = run_command("git remote -v", project_path)
+    current_url = git_config_snapshot(project_path).get("remote.origin.url")
 
-    if check_success and "origin" in check_output:
+    if current_url is not None:
         print_info("远程仓库已配置")
+        print_info(f"当前URL: {current_url}")
 
-        # 获取当前URL
-        url_success, current_url = run_command("git remote get-url origin", project_path)
-        if url_success:
-            print_info(f"当前URL: {current_url}")
-
-            if current_url.strip() == remote_url:
-                print_success("远程配置正确")
+        if current_url.strip() == remote_url:
+            print_success("远程配置正确")
+            return True
+        else:
+            print_warning("远程URL不匹配")
+            # 更新URL
+            update_success, _ = run_command(["git", "remote", "set-url", "origin", remote_url], project_path)
+            if update_success:
+                print_success("远程URL更新成功")
                 return True
-            else:
-                print_warning("远程URL不匹配")
-                # 更新URL
-                update_success, _ = run_command(f"git remote set-url origin {remote_url}", project_path)
-                if update_success:
-                    print_success("远程URL更新成功")
-                    return True
-
-    # 检查远程仓库是否存在
-    if not check_remote_repo_exists(remote_url):
-        print_warning("远程仓库可能不存在")
-        print_info(f"请确认仓库存在: https://github.com/{username}/{repo_name}")
-        create = input("是否继续? (y/N): ").lower()
-        if create not in ['y', 'yes']:
-            return False
 
     # 添加远程仓库
-    add_success, output = run_command(f"git remote add origin {remote_url}", project_path)
+    add_success, output = run_command(["git", "remote", "add", "origin", remote_url], project_path)
 
     if add_success or "already exists" in output:
         print_success("远程仓库配置成功")
@@ -174,57 +279,248 @@ def smart_setup_remote(project_path: str, remote_url: str, repo_name: str, usern
     return False
 
 
-def check_git_status(project_path: str) -> Tuple[bool, int]:
-    """检查Git状态，返回是否有更改和文件数量"""
-    success, output = run_command("git status --porcelain", project_path)
-    if not success:
-        return False, 0
+# porcelain v2 各类记录中路径之前的空格分隔字段数：1=普通更改，2=重命名/复制，u=未合并，?=未跟踪
+_STATUS_PATH_FIELDS = {b'1': 8, b'2': 9, b'u': 10, b'?': 1}
+
 
-    files = [line for line in output.split('\n') if line.strip()]
-    return True, len(files)
+def check_git_status(project_path: str) -> Tuple[bool, List[bytes]]:
+    """
+    检查Git状态，返回是否成功和有更改的文件路径（git输出的原始字节）
+    边读取 git status 的输出边解析，只保留路径；
+    --no-optional-locks 避免状态查询去抢 index.lock
+    """
+    argv = ["git", "--no-optional-locks", "status", "--porcelain=v2", "-z", "--untracked-files=all"]
 
+    # 每条记录以NUL结尾；2=重命名/复制的记录后面还跟一个原路径字段（重命名已在暂存区，不需要再添加）
+    paths = []
+    skip_next = False
+    pending = b""
+    try:
+        with subprocess.Popen(argv, cwd=project_path, stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL) as proc:
+            for chunk in iter(lambda: proc.stdout.read1(65536), b""):
+                records = (pending + chunk).split(b"\0")
+                pending = records.pop()
+                for record in records:
+                    if skip_next:
+                        skip_next = False
+                        continue
+                    kind = record[:1]
+                    fields = _STATUS_PATH_FIELDS.get(kind)
+                    if fields is not None:
+                        paths.append(record.split(b' ', fields)[fields])
+                    skip_next = kind == b'2'
+            returncode = proc.wait(timeout=30)
+    except (OSError, subprocess.SubprocessError):
+        return False, []
+
+    if returncode != 0:
+        return False, []
+    return True, paths
+
+
+def git_add(paths: List[bytes], cwd: str = None) -> Tuple[bool, str]:
+    """
+    只暂存 git status 列出的文件，不再让 git add -A 重新遍历整个工作区
+    路径以NUL分隔通过标准输入传入（--pathspec-from-file，git 2.26+），不受命令行长度限制；
+    --literal-pathspecs 使文件名中的 * ? 等字符不被当作通配符。旧版git不支持时退回 git add -A
+    """
+    _read_only_cache.clear()
+    try:
+        result = subprocess.run(
+            ["git", "--literal-pathspecs", "add", "-A", "--pathspec-from-file=-", "--pathspec-file-nul"],
+            cwd=cwd, input=b"\0".join(paths), capture_output=True, timeout=30
+        )
+    except Exception as e:
+        return False, str(e)
 
-def get_commit_message() -> str:
-    """获取提交信息"""
-    default_msg = "汽车电源测试框架代码更新"
-    print(f"提交理由 (回车使用默认): {default_msg}")
-    user_msg = input("您的理由: ").strip()
+    if result.returncode == 0:
+        return True, result.stdout.strip().decode('utf-8', errors='replace')
+    if b"pathspec-from-file" in result.stderr:
+        return run_command(["git", "add", "-A"], cwd)
+    return False, result.stderr.strip().decode('utf-8', errors='replace')
+
+
+def get_commit_message(preset: Optional[str] = None) -> str:
+    """
+    获取提交信息，preset 为命令行参数或环境变量给出的提交理由，给出时不再询问；
+    标准输入不是终端时同样不询问，使用默认理由
+    """
+    if preset is not None:
+        user_msg = preset.strip()
+    elif not sys.stdin.isatty():
+        user_msg = ""
+    else:
+        print(f"提交理由 (回车使用默认): {_DEFAULT_COMMIT_MESSAGE}")
+        user_msg = input("您的理由: ").strip()
 
     if not user_msg:
-        user_msg = default_msg
+        user_msg = _DEFAULT_COMMIT_MESSAGE
 
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     return f"{user_msg} - {timestamp}"
 
 
+# 推送失败时的重试策略：指数退避 + 随机抖动
+_PUSH_RETRIES = 3
+_PUSH_BACKOFF_BASE = 0.5  # 秒
+_PUSH_BACKOFF_CAP = 8.0  # 秒
+
+# 远程仓库不存在时git push的错误输出（HTTPS与SSH）
+_REPO_NOT_FOUND_ERRORS = ("Repository not found", "does not exist")
+
+# 重试也不会成功的推送错误（冲突、认证失败、本地没有main分支、仓库不存在等），遇到时立即返回
+_NON_RETRYABLE_PUSH_ERRORS = (
+    *_REPO_NOT_FOUND_ERRORS,
+    "rejected",
+    "non-fast-forward",
+    "Authentication failed",
+    "Permission denied",
+    "does not match any",
+)
+
+
+def probe_remote_port(remote_url: str) -> bool:
+    """检查远程主机的端口能否直连（SSH为22，HTTPS为443，超时3秒）"""
+    import socket
+    import urllib.parse
+
+    if "://" in remote_url:
+        parts = urllib.parse.urlsplit(remote_url)
+        host = parts.hostname
+        port = parts.port or (22 if parts.scheme == "ssh" else 443)
+    else:
+        # scp风格的SSH地址: git@github.com:user/repo.git
+        host, port = remote_url.split("@", 1)[-1].split(":", 1)[0], 22
+
+    try:
+        with socket.create_connection((host, port), timeout=3):
+            return True
+    except OSError:
+        return False
+
+
+def start_probe_remote_port(remote_url: str) -> Future:
+    """
+    在后台守护线程中执行 probe_remote_port，返回其结果的Future
+    守护线程不会在DNS解析缓慢时拖住进程退出
+    """
+    future: Future = Future()
+
+    def probe():
+        try:
+            future.set_result(probe_remote_port(remote_url))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=probe, name="remote-probe", daemon=True).start()
+    return future
+
+
+def remote_reachable(remote_url: str, project_path: str, probe: Optional[Future] = None) -> bool:
+    """
+    快速检查远程主机能否连接
+    配置了代理时直连探测没有意义，直接视为可达；probe 为提前在后台发起的 probe_remote_port 结果
+    """
+    if any(os.environ.get(var) for var in ("https_proxy", "HTTPS_PROXY", "all_proxy", "ALL_PROXY")):
+        return True
+    git_config = git_config_snapshot(project_path)
+    if git_config.get("http.proxy") or git_config.get("https.proxy"):
+        return True
+
+    if probe is not None:
+        return probe.result()
+    return probe_remote_port(remote_url)
+
+
+# --porcelain 使每个引用的结果以 "标志<TAB>本地:远程<TAB>摘要" 一行输出在标准输出上，
+# 不用在提示文本中查找关键字；--atomic 使所有引用在服务器端作为一个事务更新
+_PUSH_ARGV = ["git", "push", "-u", "--atomic", "--porcelain", "origin", "main"]
+
+
+def push_rejected(output: str) -> bool:
+    """
+    根据 git push --porcelain 的标志列判断是否有引用因远程已有新提交被拒绝（non-fast-forward / fetch first）
+    服务器端钩子、分支保护等拒绝（[remote rejected]）不算，拉取合并也解决不了
+    """
+    for line in output.splitlines():
+        flag, _, rest = line.partition("\t")
+        if flag == "!" and rest.partition("\t")[2].startswith("[rejected]"):
+            return True
+    return False
+
+
+def push_with_retry(project_path: str, remote_url: str, retries: int = _PUSH_RETRIES,
+                    first_probe: Optional[Future] = None) -> Tuple[bool, str]:
+    """
+    推送到GitHub，网络抖动等临时错误按指数退避重试
+    第一次总是直接推送：git可能经 ~/.ssh/config、insteadOf、按URL的代理或 GIT_SSH_COMMAND 连接，
+    直连探测失败不代表推送会失败。推送失败后才探测远程主机，无法连接时不再重试；
+    第一次探测可以使用 first_probe（在本地步骤执行期间已在后台完成）
+    """
+    import random
+
+    success, output = False, ""
+
+    for attempt in range(retries):
+        if attempt:
+            if not remote_reachable(remote_url, project_path, first_probe if attempt == 1 else None):
+                print_warning("无法连接到远程主机，不再重试")
+                break
+
+            delay = min(_PUSH_BACKOFF_CAP,
+                        _PUSH_BACKOFF_BASE * 2 ** (attempt - 1) + random.uniform(0, 0.25))
+            print_info(f"推送失败，{delay:.1f}秒后重试 ({attempt + 1}/{retries})...")
+            time.sleep(delay)
+
+        success, output = run_command(_PUSH_ARGV, project_path)
+        if success or any(marker in output for marker in _NON_RETRYABLE_PUSH_ERRORS):
+            break
+
+    return success, output
+
+
 def handle_push_conflict(project_path: str) -> bool:
     """处理推送冲突"""
     print_warning("检测到推送冲突")
 
     # 先尝试拉取
     print_info("尝试拉取远程更改...")
-    pull_success, _ = run_command("git pull origin main --allow-unrelated-histories", project_path, True)
+    pull_success, _ = run_command(["git", "pull", "origin", "main", "--allow-unrelated-histories"], project_path, True)
 
     if pull_success:
         # 提交合并
-        run_command('git commit -m "合并远程更改"', project_path)
+        git_commit(_MERGE_COMMIT_MESSAGE, project_path)
 
     # 安全强制推送
     print_info("尝试安全强制推送...")
-    force_success, _ = run_command("git push -u origin main --force-with-lease", project_path, True)
+    force_success, _ = run_command(["git", "push", "-u", "origin", "main", "--force-with-lease"], project_path, True)
     if force_success:
         return True
 
-    # 最终强制推送（需要确认）
-    confirm = input("是否尝试强制推送? (y/N): ").lower()
-    if confirm in ['y', 'yes']:
-        final_success, _ = run_command("git push -u origin main --force", project_path, True)
+    # 最终强制推送（需要确认，非交互运行时不强制推送）
+    if confirm("是否尝试强制推送? (y/N): "):
+        final_success, _ = run_command(["git", "push", "-u", "origin", "main", "--force"], project_path, True)
         return final_success
 
     return False
 
 
-def main():
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="汽车电源测试框架 - Git仓库设置工具")
+    parser.add_argument("--username", default=os.environ.get("GH_USER"),
+                        help="GitHub用户名（默认取环境变量 GH_USER）")
+    parser.add_argument("--repo", default=os.environ.get("GH_REPO"),
+                        help="仓库名称（默认取环境变量 GH_REPO）")
+    parser.add_argument("--path", default=os.environ.get("GIT_PROJECT_PATH"),
+                        help="项目路径（默认取环境变量 GIT_PROJECT_PATH）")
+    parser.add_argument("--ssh", action="store_true", help="使用SSH协议（默认HTTPS）")
+    parser.add_argument("--message", default=os.environ.get("GIT_COMMIT_MSG"),
+                        help="提交理由（默认取环境变量 GIT_COMMIT_MSG）")
+    args = parser.parse_args(argv)
+
     print("=" * 60)
     print("汽车电源测试框架 - Git仓库设置工具")
     print("=" * 60)
@@ -234,15 +530,17 @@ def main():
     print("-" * 40)
 
     # GitHub用户名
-    username = get_github_username()
+    username = get_github_username(args.username)
+    if username is None:
+        return 1
 
     # 仓库名称
-    repo_name = input("仓库名称 [car_power_auto_platform]: ").strip()
+    repo_name = args.repo or input("仓库名称 [car_power_auto_platform]: ").strip()
     if not repo_name:
         repo_name = "car_power_auto_platform"
 
     # 项目路径
-    project_path = input("项目路径: ").strip()
+    project_path = args.path or input("项目路径: ").strip()
     if not project_path:
         project_path = "."
 
@@ -252,7 +550,7 @@ def main():
         return 1
 
     # 协议选择
-    use_ssh = input("使用SSH协议? (y/N): ").strip().lower() in ['y', 'yes']
+    use_ssh = args.ssh or confirm("使用SSH协议? (y/N): ")
     if use_ssh:
         remote_url = f"git@github.com:{username}/{repo_name}.git"
         print_info("使用SSH协议")
@@ -271,51 +569,59 @@ def main():
 
     # 执行步骤
     steps = [
-        ("检查Git安装", "git --version"),
-        ("初始化仓库", "git init"),
-        ("配置用户", f'git config user.name "{username}"'),
-        ("配置邮箱", f'git config user.email "{username}@users.noreply.github.com"'),
+        ("检查Git安装", ["git", "--version"]),
+        # 新仓库直接以main为初始分支，推送 main 时无需再执行 git branch -M main
+        ("初始化仓库", ["git", "-c", "init.defaultBranch=main", "init"]),
+        ("配置用户信息", ""),  # 特殊处理
         ("智能远程设置", ""),  # 特殊处理
         ("检查代码状态", ""),  # 特殊处理
-        ("添加文件", "git add ."),
+        ("添加文件", ""),  # 特殊处理（只添加检查到的文件）
         ("提交更改", ""),  # 特殊处理
-        ("推送到GitHub", "git push -u origin main"),
+        ("推送到GitHub", ""),  # 特殊处理（失败时重试）
     ]
 
+    # 没有更改时跳过的步骤
+    change_steps = {"添加文件", "提交更改", "推送到GitHub"}
+
     all_success = True
     has_changes = True
+    changed_paths: List[bytes] = []
+    reachability: Optional[Future] = None
 
     for i, (desc, cmd) in enumerate(steps, 1):
         print_step(i, len(steps), desc)
+        output = ""
 
-        if desc == "智能远程设置":
-            success = smart_setup_remote(str(project_path), remote_url, repo_name, username)
+        if not has_changes and desc in change_steps:
+            print_info("跳过步骤（无更改）")
+            success = True
+        elif desc == "智能远程设置":
+            success = smart_setup_remote(str(project_path), remote_url)
+        elif desc == "配置用户信息":
+            success = configure_git_user(project_path, username)
         elif desc == "检查代码状态":
-            status_ok, file_count = check_git_status(str(project_path))
+            status_ok, changed_paths = check_git_status(str(project_path))
+            file_count = len(changed_paths)
             if status_ok:
                 if file_count == 0:
                     print_warning("没有检测到更改")
                     has_changes = False
-                    # 跳过后续步骤
-                    steps[i] = ("添加文件", "skip")
-                    steps[i + 1] = ("提交更改", "skip")
-                    steps[i + 2] = ("推送到GitHub", "skip")
                     success = True
                 else:
                     print_success(f"检测到 {file_count} 个文件需要提交")
                     success = True
+                    # 推送失败后决定是否重试的连通性探测只依赖远程地址（网络等待最长3秒），
+                    # 确定需要推送后即在后台发起，与添加、提交步骤并行
+                    reachability = start_probe_remote_port(remote_url)
             else:
                 success = False
+        elif desc == "添加文件":
+            success, output = git_add(changed_paths, str(project_path))
         elif desc == "提交更改":
-            if not has_changes:
-                print_info("跳过提交（无更改）")
-                success = True
-            else:
-                commit_msg = get_commit_message()
-                success, output = run_command(f'git commit -m "{commit_msg}"', str(project_path))
-        elif cmd == "skip":
-            print_info("跳过步骤")
-            success = True
+            commit_msg = get_commit_message(args.message)
+            success, output = git_commit(commit_msg, str(project_path))
+        elif desc == "推送到GitHub":
+            success, output = push_with_retry(str(project_path), remote_url, first_probe=reachability)
         else:
             success, output = run_command(cmd, str(project_path))
 
@@ -325,7 +631,12 @@ def main():
             print_error("失败")
 
             # 特殊错误处理
-            if "non-fast-forward" in output and "推送到GitHub" in desc:
+            if desc == "推送到GitHub" and any(marker in output for marker in _REPO_NOT_FOUND_ERRORS):
+                print_warning("远程仓库不存在或无权访问")
+                print_info(f"请先在GitHub上创建仓库 '{repo_name}'（不要初始化README）: https://github.com/new")
+                print_info("创建后重新运行本工具，或手动执行: git push -u origin main")
+
+            if desc == "推送到GitHub" and push_rejected(output):
                 if handle_push_conflict(str(project_path)):
                     success = True
                     print_success("冲突解决成功")
@@ -347,10 +658,11 @@ def main():
     }
 
     # 保存报告
+    import json
+
     report_file = project_path / "git_setup_report.json"
     try:
-        with open(report_file, 'w', encoding='utf-8') as f:
-            json.dump(report, f, indent=2, ensure_ascii=False)
+        report_file.write_bytes(json.dumps(report, indent=2, ensure_ascii=False).encode("utf-8"))
         print_info(f"报告已保存: {report_file.name}")
     except Exception as e:
         print_warning(f"保存报告失败: {e}")
@@ -0,0 +1,49 @@
+"""
+依赖检查工具单元测试 - requirements.txt 解析
+"""
+import pytest
+
+from check_dependencies import DependencyChecker
+
+
+@pytest.fixture
+def checker(tmp_path, monkeypatch):
+    """在临时目录中创建检查器，backups 目录不落到项目根目录"""
+    monkeypatch.chdir(tmp_path)
+    return DependencyChecker()
+
+
+def test_parse_requirements_extras(checker, tmp_path):
+    """带 [extras] 的依赖应解析出包名和版本"""
+    requirements = tmp_path / "requirements.txt"
+    requirements.write_text(
+        "requests[socks]==2.31.0\n"
+        "uvicorn[standard, http2] == 0.23.2\n"
+        "pyvisa[py]>=1.12\n",
+        encoding='utf-8'
+    )
+
+    assert checker.parse_requirements(requirements) == [
+        ("requests", "2.31.0"),
+        ("uvicorn", "0.23.2"),
+        ("pyvisa", ""),
+    ]
+
+
+def test_parse_requirements_skips_comments(checker, tmp_path):
+    """注释行、空行和选项行不计入依赖，行尾注释被忽略"""
+    requirements = tmp_path / "requirements.txt"
+    requirements.write_text(
+        "# 测试框架\n"
+        "\n"
+        "   # 缩进的注释\n"
+        "-r requirements_minimal.txt\n"
+        "pytest==7.4.0  # 行尾注释\n"
+        "ruamel.yaml==0.17.21; python_version < '3.12'\n",
+        encoding='utf-8'
+    )
+
+    assert checker.parse_requirements(requirements) == [
+        ("pytest", "7.4.0"),
+        ("ruamel.yaml", "0.17.21"),
+    ]
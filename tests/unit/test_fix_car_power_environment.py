@@ -0,0 +1,75 @@
+"""
+环境修复脚本单元测试 - 修复步骤按依赖关系调度
+"""
+import threading
+
+import pytest
+
+from fix_car_power_environment import EnvironmentFixer
+
+
+@pytest.fixture
+def fixer(tmp_path, monkeypatch):
+    """修复步骤全部替换为只记录执行顺序的函数，不调用pip、不写项目文件"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("PIP_CACHE_DIR", "")
+    monkeypatch.setenv("PIP_DISABLE_PIP_VERSION_CHECK", "")
+
+    fixer = EnvironmentFixer(assume_yes=True)
+    fixer.order = []
+    lock = threading.Lock()
+
+    def make_step(step_name, result):
+        def step():
+            with lock:
+                fixer.order.append(step_name)
+            return result
+        return step
+
+    fixer.make_step = make_step
+    for step_name, method, _ in EnvironmentFixer.FIX_STEPS:
+        setattr(fixer, method, make_step(step_name, True))
+
+    fixer.start_network_probe = lambda: None
+    fixer.print_banner = lambda: None
+    fixer.check_virtual_env = lambda: True
+    fixer.diagnose_problems = lambda: True
+    return fixer
+
+
+def test_steps_run_after_dependencies(fixer):
+    """每个步骤都在其依赖的步骤完成之后才执行，且每个步骤只执行一次"""
+    assert fixer.run()
+
+    assert sorted(fixer.order) == sorted(name for name, _, _ in EnvironmentFixer.FIX_STEPS)
+    position = {name: i for i, name in enumerate(fixer.order)}
+    for step_name, _, deps in EnvironmentFixer.FIX_STEPS:
+        for dep in deps:
+            assert position[dep] < position[step_name], f"{step_name} 早于依赖 {dep} 执行"
+
+
+def test_failed_step_still_unblocks_dependents(fixer):
+    """步骤失败且选择继续时，后续步骤照常执行，整体结果为失败"""
+    fixer.install_ruamel_yaml = fixer.make_step("安装ruamel.yaml", False)
+
+    assert not fixer.run()
+    assert len(fixer.order) == len(EnvironmentFixer.FIX_STEPS)
+
+
+def test_main_thread_steps_run_last_on_main_thread(fixer):
+    """在本进程中运行pytest的步骤在主线程中、所有并行步骤之后执行"""
+    threads = {}
+    for step_name, method, _ in EnvironmentFixer.FIX_STEPS:
+        step = getattr(fixer, method)
+
+        def record(step_name=step_name, step=step):
+            threads[step_name] = threading.current_thread()
+            return step()
+
+        setattr(fixer, method, record)
+
+    assert fixer.run()
+
+    for step_name in EnvironmentFixer.MAIN_THREAD_STEPS:
+        assert threads[step_name] is threading.main_thread()
+        assert fixer.order[-1] == step_name
@@ -0,0 +1,52 @@
+"""
+脚本公共工具单元测试 - 备份文件扫描排序与交互确认
+"""
+import io
+
+from script_utils import _BACKUP_RE, confirm, list_backups
+
+
+def test_backup_re_matches_only_timestamped_backups():
+    """只匹配 requirements_backup_YYYYMMDD_HHMMSS.txt"""
+    assert _BACKUP_RE.match("requirements_backup_20240105_093000.txt").group(1) == "20240105_093000"
+
+    for name in ("requirements_backup_20240105.txt",
+                 "requirements_backup_20240105_093000.txt.bak",
+                 "requirements_backup_2024010_093000.txt",
+                 "old_requirements_backup_20240105_093000.txt",
+                 "requirements.txt"):
+        assert _BACKUP_RE.match(name) is None, name
+
+
+def test_list_backups_newest_first(tmp_path):
+    """按文件名中的时间戳排序（最新的在前），不在乎文件修改时间，忽略其他文件"""
+    names = [
+        "requirements_backup_20231231_235959.txt",
+        "requirements_backup_20240105_093000.txt",
+        "requirements_backup_20240105_090000.txt",
+    ]
+    for name in names + ["requirements.txt", "notes.bak"]:
+        (tmp_path / name).write_text("pytest\n", encoding='utf-8')
+
+    backups = list_backups(tmp_path)
+
+    assert [name for _, name, _ in backups] == [
+        "requirements_backup_20240105_093000.txt",
+        "requirements_backup_20240105_090000.txt",
+        "requirements_backup_20231231_235959.txt",
+    ]
+    assert [timestamp for timestamp, _, _ in backups] == [
+        "20240105_093000", "20240105_090000", "20231231_235959"
+    ]
+
+
+def test_confirm_non_tty_uses_default(monkeypatch, capsys):
+    """标准输入不是终端时不读取输入，直接返回 default"""
+    monkeypatch.setattr("sys.stdin", io.StringIO("y\n"))
+
+    assert confirm("继续? (y/n): ") is False
+    assert confirm("继续? (Y/n): ", default=True) is True
+    assert confirm("继续? (y/n): ", assume_yes=True) is True
+
+    out = capsys.readouterr().out
+    assert "非交互模式" in out
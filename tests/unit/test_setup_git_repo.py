@@ -0,0 +1,68 @@
+"""
+Git仓库设置脚本单元测试 - 状态解析与推送结果判断
+"""
+import shutil
+import subprocess
+
+import pytest
+
+from setup_git_repo import check_git_status, push_rejected
+
+
+def _git(cwd, *args):
+    subprocess.run(["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+                   cwd=cwd, check=True, capture_output=True)
+
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="未安装git")
+def test_check_git_status_porcelain_v2(tmp_path):
+    """修改、重命名（只取新路径，跳过原路径字段）与未跟踪文件都应列出，含空格的文件名保持完整"""
+    _git(tmp_path, "init", "-q")
+    (tmp_path / "old name.txt").write_text("rename me\n", encoding='utf-8')
+    (tmp_path / "modified.txt").write_text("v1\n", encoding='utf-8')
+    _git(tmp_path, "add", "-A")
+    _git(tmp_path, "commit", "-q", "-m", "init")
+
+    _git(tmp_path, "mv", "old name.txt", "new name.txt")
+    (tmp_path / "modified.txt").write_text("v2\n", encoding='utf-8')
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "untracked file.txt").write_text("new\n", encoding='utf-8')
+
+    ok, paths = check_git_status(str(tmp_path))
+
+    assert ok
+    assert sorted(paths) == [b"modified.txt", b"new name.txt", b"sub/untracked file.txt"]
+
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="未安装git")
+def test_check_git_status_clean(tmp_path):
+    """没有更改时返回空列表"""
+    _git(tmp_path, "init", "-q")
+
+    assert check_git_status(str(tmp_path)) == (True, [])
+
+
+def test_push_rejected_non_fast_forward():
+    """远程已有新提交被拒绝"""
+    output = (
+        "To github.com:user/car_power_auto_platform.git\n"
+        "!\trefs/heads/main:refs/heads/main\t[rejected] (fetch first)\n"
+        "Done\n"
+    )
+    assert push_rejected(output)
+
+
+def test_push_rejected_accepted_refs():
+    """推送成功（快进、新分支）以及服务器端拒绝都不算冲突"""
+    accepted = (
+        "To github.com:user/car_power_auto_platform.git\n"
+        " \trefs/heads/main:refs/heads/main\t1a2b3c4..5d6e7f8\n"
+        "Done\n"
+    )
+    new_branch = "*\trefs/heads/main:refs/heads/main\t[new branch]\nDone\n"
+    remote_rejected = "!\trefs/heads/main:refs/heads/main\t[remote rejected] (protected branch hook declined)\n"
+
+    assert not push_rejected(accepted)
+    assert not push_rejected(new_branch)
+    assert not push_rejected(remote_rejected)
+    assert not push_rejected("")